@@ -3,27 +3,27 @@ import time
 import datetime
 import pandas as pd
 import requests
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import (
-    TimeoutException, NoSuchElementException, WebDriverException, NoSuchWindowException
-)
-# from selenium.webdriver.common.action_chains import ActionChains # 현재 직접 사용 안 함
-from webdriver_manager.chrome import ChromeDriverManager
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import urllib3
+# selenium / webdriver-manager 는 import 비용이 커서 실제로 브라우저를 쓰는 함수 안에서 import
 import logging
-import io
-import traceback
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import queue
 from pathlib import Path
+from html.parser import HTMLParser
+from urllib.parse import urljoin
 import json
-import re
-import numpy as np
 import sys
 import os
 import subprocess
+import atexit
+import functools
+import importlib.util
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
 
 # --- Configuration ---
 DEFAULT_CONFIG = {
@@ -65,15 +65,16 @@ else:
 _path_set_and_validated = False
 if _final_user_data_path:
     try:
-        if not os.path.exists(_final_user_data_path):
-            os.makedirs(_final_user_data_path, exist_ok=True)
+        # mkdir 을 먼저 시도하고, 이미 있을 때만 디렉토리 여부를 한 번 확인
+        try:
+            Path(_final_user_data_path).mkdir(parents=True)
             _path_source_info_lines.append(f"INFO: 사용자 데이터 디렉토리 생성: {_final_user_data_path}")
-        elif not os.path.isdir(_final_user_data_path):
-            _path_source_info_lines.append(f"오류: 지정된 사용자 데이터 경로 '{_final_user_data_path}'가 존재하지만 디렉토리가 아닙니다.")
-            _final_user_data_path = ""
-
-        if _final_user_data_path and os.path.isdir(_final_user_data_path):
-             _path_set_and_validated = True
+            _path_set_and_validated = True
+        except FileExistsError:
+            _path_set_and_validated = os.path.isdir(_final_user_data_path)
+            if not _path_set_and_validated:
+                _path_source_info_lines.append(f"오류: 지정된 사용자 데이터 경로 '{_final_user_data_path}'가 존재하지만 디렉토리가 아닙니다.")
+                _final_user_data_path = ""
     except Exception as e:
         _path_source_info_lines.append(f"경고: 사용자 데이터 디렉토리 '{_final_user_data_path}'를 생성하거나 접근할 수 없습니다. 오류: {e}.")
         _final_user_data_path = ""
@@ -90,9 +91,9 @@ if not _path_set_and_validated:
     _final_user_data_path = fallback_base_dir
     _path_source_info_lines.append(f"INFO: 대체 경로 사용. 사용자 데이터는 다음 위치에 저장 시도: {_final_user_data_path}")
     try:
-        if not os.path.exists(_final_user_data_path):
-            os.makedirs(_final_user_data_path, exist_ok=True)
-            _path_source_info_lines.append(f"INFO: 대체 사용자 데이터 디렉토리 생성: {_final_user_data_path}")
+        Path(_final_user_data_path).mkdir(parents=True)
+        _path_source_info_lines.append(f"INFO: 대체 사용자 데이터 디렉토리 생성: {_final_user_data_path}")
+    except FileExistsError: pass
     except Exception as e_fallback_create:
         _final_user_data_path = os.getcwd()
         _path_source_info_lines.append(f"심각: 대체 디렉토리를 생성할 수 없습니다. 오류: {e_fallback_create}. 현재 작업 디렉토리를 사용합니다: {_final_user_data_path}")
@@ -101,48 +102,85 @@ USER_DATA_PATH = _final_user_data_path
 CONFIG_FILE = os.path.join(USER_DATA_PATH, "work_day_config_headless.json")
 LOG_FILE = os.path.join(USER_DATA_PATH, 'attendance_bot_headless.log')
 DRIVERS_DIR = os.path.join(APP_ROOT_PATH, 'drivers')
+CHROMEDRIVER_CACHE_DIR = os.path.join(USER_DATA_PATH, 'chromedriver_cache')
 ICON_FILE = os.path.join(APP_ROOT_PATH, 'work_day.ico')
 
 # --- 로깅 설정 ---
-logging.basicConfig(level=logging.INFO,
-                    handlers=[
-                        logging.FileHandler(LOG_FILE, mode='a', encoding='utf-8'),
-                        logging.StreamHandler(sys.stdout)
-                    ],
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+# 호출 스레드는 큐에 넣기만 하고, 파일/콘솔 쓰기는 QueueListener 스레드가 담당 (파일은 5MB x 3개로 순환)
+_log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+_log_file_handler = RotatingFileHandler(LOG_FILE, maxBytes=5_000_000, backupCount=3, encoding='utf-8'); _log_file_handler.setFormatter(_log_formatter)
+_log_console_handler = logging.StreamHandler(sys.stdout); _log_console_handler.setFormatter(_log_formatter)
+_log_queue = queue.SimpleQueue(); _log_queue_handler = QueueHandler(_log_queue); _log_queue_handler.setFormatter(logging.Formatter('%(message)s'))
+logging.basicConfig(level=logging.INFO, handlers=[_log_queue_handler])
+_log_listener = QueueListener(_log_queue, _log_file_handler, _log_console_handler)
+_log_listener.start(); atexit.register(_log_listener.stop) # 종료 시 큐에 남은 로그를 모두 기록 (파일 flush 는 logging.shutdown 이 담당)
+logger = logging.getLogger(__name__)
 
 # --- 상수 ---
 WEBMAIL_LOGIN_URL = "http://gw.ktmos.co.kr/mail2/loginPage.do"
 WEBMAIL_ID_FIELD_ID = "userEmail"; WEBMAIL_PW_FIELD_ID = "userPw"
 REPORT_DOWNLOAD_URL_TEMPLATE = "http://gw.ktmos.co.kr/owattend/rest/dclz/report/CompositeStatus/sumr/user/days/excel?startDate={date}&endDate={date}&deptSeq=1231&erpNumDisplayYn=Y"
 EXCEL_SHEET_NAME = "세부현황_B"
+BROWSER_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 STANDARD_START_TIME_STR = "09:00:00"; STANDARD_END_TIME_STR = "18:00:00"
 EVENING_RUN_THRESHOLD_HOUR = 18
-LEAVE_ACTIVITY_TYPES = {"법정휴가", "보상휴가", "출장", "교육", "공가", "병가", "경조휴가", "특별휴가"}
-FULL_DAY_REASONS = {"연차", "출산휴가", "출산전후휴가", "청원휴가", "가족돌봄휴가", "특별휴가", "공가", "공상", "예비군훈련", "민방위훈련", "공로휴가", "병가"}
+LEAVE_ACTIVITY_TYPES = frozenset({"법정휴가", "보상휴가", "출장", "교육", "공가", "병가", "경조휴가", "특별휴가"})
+FULL_DAY_REASONS = frozenset({"연차", "출산휴가", "출산전후휴가", "청원휴가", "가족돌봄휴가", "특별휴가", "공가", "공상", "예비군훈련", "민방위훈련", "공로휴가", "병가"})
 MORNING_HALF_LEAVE_REASON = "오전반차"; AFTERNOON_HALF_LEAVE_REASON = "오후반차"
 NORMAL_WORK_TYPE = "출퇴근"; NORMAL_WORK_CATEGORY = "정상"
+# 휴가 구분 -> 종류 ('morn' 오전반차, 'aft' 오후반차, 'full' 종일). 없으면 시간대로 판단하는 'partial'
+_CAT_KIND = {MORNING_HALF_LEAVE_REASON: 'morn', AFTERNOON_HALF_LEAVE_REASON: 'aft', **{reason: 'full' for reason in FULL_DAY_REASONS}}
 STD_WORK_START_TIME = datetime.time(9, 0); STD_WORK_END_TIME = datetime.time(18, 0)
 STD_LUNCH_START_TIME = datetime.time(12, 0); STD_LUNCH_END_TIME = datetime.time(13, 0)
 STD_MORNING_LEAVE_WORK_START = datetime.time(14, 0)
 STD_AFTERNOON_LEAVE_WORK_END = datetime.time(14, 0)
+# 휴가 분류를 벡터 연산으로 할 때 쓰는 기준 시각 (자정 기준 마이크로초)
+_US_WORK_START, _US_WORK_END, _US_LUNCH_START, _US_LUNCH_END = (t.hour * 3_600_000_000 + t.minute * 60_000_000 for t in (STD_WORK_START_TIME, STD_WORK_END_TIME, STD_LUNCH_START_TIME, STD_LUNCH_END_TIME))
+EXCEL_HEADER_ROWS = [0, 1]
+EXCEL_ENGINE = "calamine" if importlib.util.find_spec("python_calamine") else "openpyxl"
+# 분석에 필요한 컬럼 (평탄화된 헤더 이름 후보). 이 컬럼들만 엑셀에서 읽어들임
+COLUMN_MAPPING = {
+    'erp': ['ERP사번'], 'name': ['이름'], 'date': ['일자'],
+    'dept': ['부서'],
+    'type': ['근태_유형', '유형'], 'category': ['근태_구분', '구분'],
+    'clock_in_time': ['출퇴근_출근시간', '출근시간'], 'clock_out_time': ['출퇴근_퇴근시간', '퇴근시간'],
+    'leave_start_time': ['휴가/출장/교육 일시_시작시간', '시작시간'], 'leave_end_time': ['휴가/출장/교육 일시_종료시간', '종료시간'],
+}
+COLUMN_TARGETS = {
+    'erp': 'ERP_ID', 'name': '이름', 'date': '일자', 'type': '유형', 'category': '구분',
+    'clock_in_time': '출근시간_raw', 'clock_out_time': '퇴근시간_raw',
+    'leave_start_time': '휴가시작시간_raw', 'leave_end_time': '휴가종료시간_raw',
+}
+
+# 그룹웨어 로그인/보고서 다운로드가 공유하는 세션 (TCP 연결 재사용, 일시적 게이트웨이 오류 재시도)
+_HTTP = requests.Session()
+_HTTP_ADAPTER = HTTPAdapter(max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504]), pool_connections=2, pool_maxsize=4)
+_HTTP.mount("http://", _HTTP_ADAPTER); _HTTP.mount("https://", _HTTP_ADAPTER)
+_HTTP.headers.update({'User-Agent': BROWSER_USER_AGENT})
+
+# 텔레그램 전송 전용 커넥션 풀 (requests 의 세션/쿠키/리다이렉트 처리 없이 keep-alive 재사용)
+_TG_POOL = urllib3.PoolManager(num_pools=1, maxsize=4, retries=urllib3.Retry(total=3, backoff_factor=0.2))
 
 # --- Helper Functions ---
-def log_message(message, level="INFO"):
-    # timestamp = datetime.datetime.now().strftime("%H:%M:%S") # 로깅 프레임워크가 시간 자동 추가
-    # formatted_message = f"[{timestamp} {level}] {message}"
-    if level == "ERROR":
-        logging.error(message)
-    elif level == "WARNING":
-        logging.warning(message)
-    elif level == "DEBUG":
-        logging.debug(message)
-    else:
-        logging.info(message)
+def _chrome_version_from_registry():
+    # Chrome 이 직접 기록하는 BLBeacon 버전 값 (프로세스 실행 없이 즉시 조회, 없으면 None). 사용자 설치는 HKCU, 시스템 설치는 HKLM
+    try: import winreg
+    except ImportError: return None
+    for hive in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+        try:
+            with winreg.OpenKey(hive, r"Software\Google\Chrome\BLBeacon") as key:
+                version = str(winreg.QueryValueEx(key, "version")[0]).strip()
+                if version: return version
+        except OSError: continue
+    return None
 
+@functools.lru_cache(maxsize=1) # 같은 프로세스 안에서 Chrome 버전은 바뀌지 않음
 def get_chrome_version():
     try:
-        if sys.platform == "win32":
+        version_str = _chrome_version_from_registry() if sys.platform == "win32" else None
+        if version_str:
+            logger.info("Chrome version read from registry (BLBeacon).")
+        elif sys.platform == "win32":
             program_files_x86 = os.environ.get('ProgramFiles(x86)')
             program_files = os.environ.get('ProgramFiles')
             chrome_path_x86 = os.path.join(program_files_x86, 'Google', 'Chrome', 'Application', 'chrome.exe') if program_files_x86 else None
@@ -150,37 +188,73 @@ def get_chrome_version():
             chrome_exe_path = None
             if chrome_path_x86 and os.path.exists(chrome_path_x86): chrome_exe_path = chrome_path_x86
             elif chrome_path_pf and os.path.exists(chrome_path_pf): chrome_exe_path = chrome_path_pf
-            else: log_message("Chrome not found in standard Windows locations.", "WARNING"); return None
-            cmd = f'powershell -command "(Get-Item \\"{chrome_exe_path}\\").VersionInfo.ProductVersion"'
-            result = subprocess.run(cmd, capture_output=True, text=True, shell=True, check=False, encoding='utf-8')
+            else: logger.warning("Chrome not found in standard Windows locations."); return None
+            # cmd.exe 를 거치지 않고 직접 실행, 프로필 로딩 생략
+            cmd = ["powershell", "-NoProfile", "-NonInteractive", "-Command", f'(Get-Item "{chrome_exe_path}").VersionInfo.ProductVersion']
+            result = subprocess.run(cmd, capture_output=True, text=True, shell=False, check=False, encoding='utf-8', timeout=5)
         elif sys.platform.startswith("linux"):
-            cmd = 'google-chrome --version'
-            result = subprocess.run(cmd, capture_output=True, text=True, shell=True, check=False)
+            cmd = ["google-chrome", "--version"]
+            result = subprocess.run(cmd, capture_output=True, text=True, shell=False, check=False, timeout=5)
         else:
-            log_message(f"Chrome version check not implemented for {sys.platform}", "WARNING")
-            return None
-
-        if result.returncode != 0 or not result.stdout:
-            log_message(f"Chrome version command failed or returned empty. stderr: {result.stderr}", "ERROR")
+            logger.warning(f"Chrome version check not implemented for {sys.platform}")
             return None
 
-        version_str = result.stdout.strip()
+        if not version_str:
+            if result.returncode != 0 or not result.stdout:
+                logger.error(f"Chrome version command failed or returned empty. stderr: {result.stderr}")
+                return None
+            version_str = result.stdout.strip()
         if "Google Chrome" in version_str:
             version_str = version_str.split("Google Chrome ")[-1]
 
-        log_message(f"Chrome version string: {version_str}")
+        logger.info(f"Chrome version string: {version_str}")
         major_version = version_str.split('.')[0]
         if major_version.isdigit():
-            log_message(f"Chrome major version: {major_version}")
+            logger.info(f"Chrome major version: {major_version}")
             return int(major_version)
         else:
-            log_message(f"Cannot parse version: {version_str}", "ERROR"); return None
-    except FileNotFoundError: log_message("Version check command (powershell/google-chrome) not found.", "ERROR"); return None
-    except Exception as e: log_message(f"Get version error: {e}", "ERROR"); logging.exception("Get Version Error"); return None
+            logger.error(f"Cannot parse version: {version_str}"); return None
+    except FileNotFoundError: logger.error("Version check command (powershell/google-chrome) not found."); return None
+    except subprocess.TimeoutExpired: logger.error("Chrome version command timed out."); return None
+    except Exception as e: logger.error(f"Get version error: {e}"); logger.exception("Get Version Error"); return None
+
+def resolve_cached_driver_path(chrome_major_version):
+    # Chrome 메이저 버전별로 받아둔 chromedriver 를 재사용 (매 실행마다 webdriver-manager 네트워크 조회 방지)
+    driver_file_name = "chromedriver.exe" if sys.platform == "win32" else "chromedriver"
+    cached_path = os.path.join(CHROMEDRIVER_CACHE_DIR, str(chrome_major_version), driver_file_name) if chrome_major_version else None
+    if cached_path and os.path.isfile(cached_path) and os.access(cached_path, os.X_OK): # 캐시 복원 과정에서 실행 권한이 빠진 파일은 다시 받음
+        logger.info(f"Using cached ChromeDriver for Chrome {chrome_major_version}: {cached_path}")
+        return cached_path
+
+    try:
+        from webdriver_manager.chrome import ChromeDriverManager
+    except ImportError:
+        raise Exception("chromedriver를 PATH/캐시에서 찾을 수 없고 webdriver-manager도 설치되어 있지 않습니다.")
+    logger.info("Attempting to install/setup ChromeDriver using webdriver-manager...")
+    os.environ.setdefault("WDM_LOG_LEVEL", "0") # webdriver-manager 자체 로그는 끄고 결과만 우리 로그에 남김 (재시도 없이 1회만 호출)
+    try:
+        installed_path = ChromeDriverManager().install()
+    except Exception as wdm_error:
+        logger.error(f"webdriver-manager failed: {wdm_error}")
+        raise Exception(f"webdriver-manager failed to provide a ChromeDriver: {wdm_error}")
+
+    if cached_path:
+        try:
+            os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+            shutil.copy2(installed_path, cached_path)
+            logger.info(f"Cached ChromeDriver for Chrome {chrome_major_version} at {cached_path}")
+            return cached_path
+        except OSError as cache_err:
+            logger.warning(f"Could not cache ChromeDriver ({cache_err}). Using webdriver-manager path.")
+    return installed_path
 
 # --- Selenium/Requests/Parsing/Report Functions ---
 def setup_driver():
-    log_message("Setting up ChromeDriver...")
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.common.exceptions import WebDriverException
+
+    logger.info("Setting up ChromeDriver...")
     options = webdriver.ChromeOptions()
     options.add_argument("--headless")
     options.add_argument("--disable-gpu")
@@ -188,11 +262,21 @@ def setup_driver():
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--window-size=1920,1080")
     options.add_argument("--disable-extensions") # 추가된 옵션
+    options.add_argument("--blink-settings=imagesEnabled=false") # 로그인 폼 입력에 이미지 렌더링 불필요
+    for flag in ("--disable-background-networking", "--disable-sync", "--disable-translate", "--disable-default-apps", "--mute-audio"):
+        options.add_argument(flag) # 로그인/쿠키 획득에 불필요한 백그라운드 요청 차단
+    options.page_load_strategy = "eager" # driver.get()이 DOMContentLoaded 시점에 반환 (이미지/하위 리소스 로드 대기 안 함)
     # User-Agent는 고정하거나, get_chrome_version()의 결과를 신뢰할 수 있을 때 동적으로 설정
     # 현재는 안정성을 위해 고정된 최신 버전대 User-Agent 사용
-    options.add_argument(f"user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36") # 예시 최신 UA
+    options.add_argument(f"user-agent={BROWSER_USER_AGENT}") # 예시 최신 UA
     options.add_experimental_option("excludeSwitches", ["enable-logging"])
-    prefs = {"credentials_enable_service": False, "profile.password_manager_enabled": False}
+    prefs = {
+        "credentials_enable_service": False, "profile.password_manager_enabled": False,
+        "profile.managed_default_content_settings.images": 2,
+        "profile.default_content_setting_values.notifications": 2,
+        "profile.managed_default_content_settings.plugins": 2,
+        # 스타일시트는 차단하지 않음: 로그인 필드 대기가 visibility 기반이라 CSS 가 없으면 표시 여부 판정이 달라질 수 있음
+    }
     options.add_experimental_option("prefs", prefs)
 
     # ChromeDriver 로그 활성화 (디버깅용)
@@ -200,138 +284,276 @@ def setup_driver():
     service_args = [] # 기본값은 로그 없음
 
     service = None
+    driver = None
     try:
-        log_message("Attempting to install/setup ChromeDriver using webdriver-manager...")
-        try:
-            service = Service(ChromeDriverManager().install(), service_args=service_args)
-        except Exception as wdm_error:
-            log_message(f"webdriver-manager failed: {wdm_error}", "ERROR")
-            log_message(f"Attempting to use ChromeDriverManager with a generic version.", "WARNING")
+        # 이미지/러너에 미리 설치된 chromedriver 가 있으면 webdriver-manager 네트워크 조회 없이 바로 사용
+        system_driver_path = shutil.which("chromedriver")
+        if system_driver_path:
+            logger.info(f"Using preinstalled chromedriver: {system_driver_path}")
             try:
-                service = Service(ChromeDriverManager().install(), service_args=service_args)
-            except Exception as wdm_fallback_error:
-                log_message(f"webdriver-manager fallback also failed: {wdm_fallback_error}", "ERROR")
-                raise Exception(f"webdriver-manager failed to provide a ChromeDriver: {wdm_fallback_error}")
-
-        log_message(f"Initializing WebDriver with service path: {service.path if service else 'N/A'}")
-        driver = webdriver.Chrome(service=service, options=options)
+                service = Service(system_driver_path, service_args=service_args)
+                driver = webdriver.Chrome(service=service, options=options)
+            except WebDriverException as sys_driver_error:
+                logger.warning(f"Preinstalled chromedriver failed (likely version mismatch), falling back to webdriver-manager: {sys_driver_error}")
+                driver = None
+
+        if driver is None:
+            service = Service(resolve_cached_driver_path(get_chrome_version()), service_args=service_args)
+            logger.info(f"Initializing WebDriver with service path: {service.path if service else 'N/A'}")
+            driver = webdriver.Chrome(service=service, options=options)
         
         # === 페이지 로드 타임아웃 설정 ===
-        driver.set_page_load_timeout(180) # 180초 (3분)으로 설정
+        driver.set_page_load_timeout(60) # eager 로드 전략이라 DOMContentLoaded 까지만 대기하므로 60초면 충분
         # ===============================
-        
-        driver.implicitly_wait(20) # 암시적 대기 시간 약간 증가 (기존 15초)
-        log_message("ChromeDriver and WebDriver setup complete.")
+        # 암시적 대기는 사용하지 않음 (명시적 WebDriverWait 과 섞이면 대기 시간이 누적됨)
+        logger.info("ChromeDriver and WebDriver setup complete.")
         return driver
     except WebDriverException as e:
-        log_message(f"WebDriverException on init: {e}", "ERROR")
-        if "version mismatch" in str(e).lower(): log_message("Version mismatch likely.", "ERROR")
-        logging.exception("WebDriver Init Error")
+        logger.error(f"WebDriverException on init: {e}")
+        if "version mismatch" in str(e).lower(): logger.error("Version mismatch likely.")
+        logger.exception("WebDriver Init Error")
         raise
     except Exception as e:
-        log_message(f"Unexpected WebDriver init error: {e}", "ERROR")
-        logging.exception("WebDriver Init Error")
+        logger.error(f"Unexpected WebDriver init error: {e}")
+        logger.exception("WebDriver Init Error")
         raise
 
+def get_driver():
+    # 한 프로세스 안에서는 Chrome 을 한 번만 띄우고 재사용 (종료 시 atexit 로 quit)
+    global _driver_singleton
+    if _driver_singleton is not None:
+        try:
+            if _driver_singleton.session_id:
+                _driver_singleton.current_url # 세션이 살아있는지 확인 (크래시 시 예외 발생)
+                _driver_singleton.delete_all_cookies()
+                logger.info("Reusing existing WebDriver session.")
+                return _driver_singleton
+        except Exception as e:
+            logger.warning(f"Existing WebDriver session is not usable, relaunching: {e}")
+        quit_driver()
+    _driver_singleton = setup_driver()
+    return _driver_singleton
+
+def quit_driver():
+    global _driver_singleton
+    driver, _driver_singleton = _driver_singleton, None
+    if driver is None:
+        return
+    from selenium.common.exceptions import WebDriverException, NoSuchWindowException
+    logger.info("Attempting to quit WebDriver...")
+    try:
+        driver.quit()
+        logger.info("WebDriver closed successfully.")
+    except NoSuchWindowException:
+         logger.warning("WebDriver window already closed or inaccessible during quit.")
+    except WebDriverException as e:
+        if "disconnected" in str(e).lower() or "invalid session id" in str(e).lower() or "unable to connect" in str(e).lower():
+             logger.warning(f"WebDriver already disconnected or crashed before quit: {e}")
+        else:
+             logger.warning(f"WebDriverException during quit: {e}")
+    except Exception as e:
+        logger.warning(f"Unexpected error during WebDriver quit: {e}")
+
+_driver_singleton = None
+atexit.register(quit_driver)
+
+def wait_js(driver, expr, timeout, interval=0.1):
+    # findElement 왕복 대신 JS 식 하나를 짧은 간격으로 평가. 페이지 전환 중 스크립트 오류는 '아직 아님'으로 간주
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if driver.execute_script(f"return ({expr})"): return True
+        except WebDriverException: pass
+        if time.monotonic() >= deadline: raise TimeoutException(f"JS condition not met within {timeout}s: {expr}")
+        time.sleep(interval)
+
+_LOGIN_ERROR_SELECTOR = ".login_box .error, .error_msg, #errormsg, .warning, .alert, [class*='error'], [id*='error']"
+# innerText 는 숨겨진 요소에서 빈 문자열이므로 getClientRects 와 함께 화면 표시 여부를 판단
+_LOGIN_ERROR_TEXT_JS = """
+for (const el of document.querySelectorAll(arguments[0])) {
+    if (!el.getClientRects().length || getComputedStyle(el).visibility === 'hidden') continue;
+    const text = (el.innerText || '').trim();
+    if (text) return text;
+}
+return '';
+"""
+
 def login_and_get_cookies(driver, url, username_id, password_id, username, password):
-    log_message(f"Navigating to login page: {url}")
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+
+    logger.info(f"Navigating to login page: {url}")
     try:
         driver.get(url) # 페이지 로드 타임아웃은 setup_driver에서 설정됨
     except TimeoutException as e: # driver.get() 에서 페이지 로드 타임아웃 발생 시
-        log_message(f"Page load timeout for {url}: {e}", "ERROR")
+        logger.error(f"Page load timeout for {url}: {e}")
         # 스크린샷 저장 (GitHub Actions에서는 아티팩트로 저장해야 확인 가능)
         screenshot_path = os.path.join(USER_DATA_PATH, f"pageload_timeout_screenshot_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
         try:
             driver.save_screenshot(screenshot_path)
-            log_message(f"Screenshot saved to {screenshot_path} due to page load timeout.", "INFO")
+            logger.info(f"Screenshot saved to {screenshot_path} due to page load timeout.")
         except Exception as scr_err:
-            log_message(f"Failed to save screenshot on page load timeout: {scr_err}", "WARNING")
+            logger.warning(f"Failed to save screenshot on page load timeout: {scr_err}")
         raise Exception(f"페이지 로드 타임아웃 ({driver.get_timeouts()['pageLoad'] / 1000}초 초과): {url}") from e # 원본 예외 포함하여 다시 발생
 
 
-    wait = WebDriverWait(driver, 60) # 요소 대기 시간 기존 45에서 60으로 증가
-    time.sleep(5) # 페이지 렌더링 및 JS 실행 대기 시간 기존 3에서 5로 증가
+    # 고정 sleep 없이 명시적 대기만 사용 (implicit wait 는 setup_driver 에서 쓰지 않음)
+    wait = WebDriverWait(driver, 60, poll_frequency=0.1)
+    post_login_locator = (By.ID, "btnWrite")
     try:
-        user_field = wait.until(EC.visibility_of_element_located((By.ID, username_id)));
-        pw_field = wait.until(EC.visibility_of_element_located((By.ID, password_id)))
-        user_field.clear(); time.sleep(0.2); user_field.send_keys(username); time.sleep(0.5)
-        pw_field.clear(); time.sleep(0.2); pw_field.send_keys(password); time.sleep(0.5)
-        pw_field.send_keys(Keys.RETURN); log_message(f"Submitted login.")
-        post_login_locator = (By.ID, "btnWrite")
-        wait.until(EC.presence_of_element_located((post_login_locator))); log_message("Login successful (Mail page loaded)."); time.sleep(2)
-        cookies = {c['name']: c['value'] for c in driver.get_cookies()}; log_message(f"Extracted {len(cookies)} cookies."); return cookies
+        user_field = wait.until(EC.element_to_be_clickable((By.ID, username_id)));
+        pw_field = wait.until(EC.element_to_be_clickable((By.ID, password_id)))
+        user_field.clear(); user_field.send_keys(username)
+        pw_field.clear(); pw_field.send_keys(password + Keys.RETURN); logger.info(f"Submitted login.")
+        wait_js(driver, "document.readyState !== 'loading' && !!document.getElementById('btnWrite')", 60); logger.info("Login successful (Mail page loaded).")
+        try: raw_cookies = driver.execute_cdp_cmd('Network.getAllCookies', {})['cookies'] # CDP 한 번으로 httpOnly 포함 전체 쿠키 조회
+        except (WebDriverException, KeyError): raw_cookies = driver.get_cookies()
+        cookies = {c['name']: c['value'] for c in raw_cookies}; logger.info(f"Extracted {len(cookies)} cookies."); return cookies
     except TimeoutException: # 요소 대기 타임아웃
-        current_url = driver.current_url; log_message(f"Timeout waiting for post-login element ({post_login_locator[1]}). URL: {current_url}", "WARNING")
+        current_url = driver.current_url; logger.warning(f"Timeout waiting for post-login element ({post_login_locator[1]}). URL: {current_url}")
         screenshot_path = os.path.join(USER_DATA_PATH, f"login_element_timeout_screenshot_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
         try:
             driver.save_screenshot(screenshot_path)
-            log_message(f"Screenshot saved to {screenshot_path}", "INFO")
+            logger.info(f"Screenshot saved to {screenshot_path}")
         except Exception as scr_err:
-            log_message(f"Failed to save screenshot: {scr_err}", "WARNING")
+            logger.warning(f"Failed to save screenshot: {scr_err}")
 
         login_page_check_url = url.split('?')[0]
         if login_page_check_url in current_url:
             found_error = None;
             try:
-                err_elements = driver.find_elements(By.CSS_SELECTOR, ".login_box .error, .error_msg, #errormsg, .warning, .alert, [class*='error'], [id*='error']")
-                for el in err_elements:
-                    if el.is_displayed() and el.text.strip(): found_error = el.text.strip(); log_message(f"Login failure message on page: '{found_error}'", "ERROR"); break
-            except Exception as find_err: log_message(f"Could not search for login errors: {find_err}", "WARNING")
+                # 요소마다 is_displayed()/text 를 왕복 호출하지 않고, 화면에 보이는 첫 오류 문구를 스크립트 한 번으로 조회
+                found_error = driver.execute_script(_LOGIN_ERROR_TEXT_JS, _LOGIN_ERROR_SELECTOR) or None
+                if found_error: logger.error(f"Login failure message on page: '{found_error}'")
+            except Exception as find_err: logger.warning(f"Could not search for login errors: {find_err}")
             if found_error: raise Exception(f"로그인 실패: {found_error}")
             else: raise Exception("로그인 실패: 타임아웃 (메일 페이지 로딩 실패 또는 로그인 정보 불일치)")
         else:
-            log_message("Redirected away from login page, but expected element not found. Assuming login issue.", "WARNING");
+            logger.warning("Redirected away from login page, but expected element not found. Assuming login issue.");
             raise Exception(f"로그인 확인 실패: 메일 페이지의 예상 요소({post_login_locator[1]})를 찾을 수 없습니다.")
     except Exception as e:
-        log_message(f"Unexpected login error: {e}", "ERROR"); logging.exception("Login error:"); raise
-
-def download_excel_report(report_url, cookies):
-    log_message(f"Downloading report: {report_url}"); session = requests.Session(); session.cookies.update(cookies)
-    user_agent_string = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36' # setup_driver와 일치 권장
-    headers = { 'User-Agent': user_agent_string, 'Referer': WEBMAIL_LOGIN_URL.split('/mail2')[0]};
-    log_message(f"Using User-Agent for download: {user_agent_string}", "DEBUG")
+        logger.error(f"Unexpected login error: {e}"); logger.exception("Login error:"); raise
+
+class _LoginFormParser(HTMLParser):
+    # 로그인 페이지의 <form> 과 그 안의 <input> (name/id/value) 만 수집
+    def __init__(self):
+        super().__init__(); self.forms = []; self._current = None
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'form':
+            self._current = {'action': attrs.get('action') or '', 'method': (attrs.get('method') or 'get').lower(), 'inputs': []}
+            self.forms.append(self._current)
+        elif tag == 'input' and self._current is not None:
+            self._current['inputs'].append(attrs)
+    def handle_endtag(self, tag):
+        if tag == 'form': self._current = None
+
+def login_via_requests(url, username_id, password_id, username, password):
+    # 브라우저 없이 로그인 폼을 직접 POST. 실패하면 None 을 반환하고 호출 측에서 Selenium 로그인으로 대체
+    session = _HTTP
+    session.cookies.clear()
+    try:
+        login_page = session.get(url, timeout=30); login_page.raise_for_status()
+        parser = _LoginFormParser(); parser.feed(login_page.text)
+        login_form = next((f for f in parser.forms if any(i.get('id') == username_id for i in f['inputs'])), None)
+        if login_form is None:
+            logger.warning(f"Login form with field '{username_id}' not found in static HTML (likely rendered by JS)."); return None
+
+        form_data = {}; field_names = {}
+        for field in login_form['inputs']:
+            name = field.get('name')
+            if field.get('id') in (username_id, password_id): field_names[field['id']] = name or field['id']
+            elif name and (field.get('type') or 'text').lower() in ('hidden', 'text'): form_data[name] = field.get('value') or ''
+        form_data[field_names.get(username_id, username_id)] = username
+        form_data[field_names.get(password_id, password_id)] = password
+        post_url = urljoin(login_page.url, login_form['action']) if login_form['action'] else login_page.url
+
+        response = session.post(post_url, data=form_data, headers={'Referer': login_page.url}, timeout=60); response.raise_for_status()
+        if 'btnWrite' not in response.text:
+            logger.warning(f"HTTP login did not reach the mail page (URL: {response.url})."); session.cookies.clear(); return None
+        logger.info(f"Login successful via HTTP form post ({len(session.cookies)} cookies).")
+        return session
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"HTTP login failed: {e}"); session.cookies.clear(); return None
+
+def warm_http_connection(url):
+    # DNS 조회 + TCP 연결만 미리 맺어 커넥션 풀에 넣어 둠. 실패해도 다운로드 단계에서 다시 연결하므로 무시
+    # 응답의 Set-Cookie(익명 세션 등)가 _HTTP 쿠키 저장소에 섞이지 않도록 같은 어댑터(커넥션 풀)만 공유하는 별도 세션 사용
+    # (세션을 close() 하면 공유 어댑터의 풀까지 닫히므로 닫지 않음)
+    base_url = urljoin(url, "/")
+    warm_session = requests.Session(); warm_session.headers.update(_HTTP.headers)
+    warm_session.mount("http://", _HTTP_ADAPTER); warm_session.mount("https://", _HTTP_ADAPTER)
     try:
-        response = session.get(report_url, headers=headers, stream=True, timeout=120);
-        log_message(f"Download HTTP status: {response.status_code}"); response.raise_for_status()
-        content_type = response.headers.get('Content-Type', '').lower();
-        is_excel = any(m in content_type for m in ['excel', 'spreadsheetml', 'vnd.ms-excel', 'octet-stream'])
-        if is_excel:
-            excel_data = io.BytesIO(response.content); file_size = excel_data.getbuffer().nbytes; log_message(f"Downloaded Excel data ({file_size} bytes).")
-            if file_size < 1024:
-                log_message(f"Small file ({file_size} bytes). Checking content for potential errors.", "WARNING");
+        warm_session.head(base_url, timeout=10, allow_redirects=False).close(); logger.info(f"Warmed HTTP connection to {base_url}")
+    except requests.exceptions.RequestException as warm_err:
+        logger.warning(f"HTTP connection warm-up failed (ignored): {warm_err}")
+
+def download_excel_report(report_url, cookies=None):
+    # 로그인과 같은 _HTTP 세션(keep-alive 커넥션 풀)으로 다운로드. Selenium 로그인 쿠키가 주어지면 저장소를 그 쿠키로만 교체
+    # (update 로 합치면 도메인 없는 중복 쿠키가 추가되어 같은 이름의 이전 쿠키가 함께 전송됨)
+    logger.info(f"Downloading report: {report_url}"); session = _HTTP
+    if cookies: session.cookies.clear(); session.cookies.update(cookies)
+    user_agent_string = BROWSER_USER_AGENT # setup_driver와 일치 권장
+    headers = { 'User-Agent': user_agent_string, 'Referer': WEBMAIL_LOGIN_URL.split('/mail2')[0], 'Accept-Encoding': 'gzip, deflate'};
+    logger.debug("Using User-Agent for download: %s", user_agent_string)
+    try:
+        with session.get(report_url, headers=headers, stream=True, timeout=120) as response: # 블록을 벗어나면 커넥션을 풀에 반환
+            logger.info(f"Download HTTP status: {response.status_code}"); response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '').lower();
+            is_excel = any(m in content_type for m in ['excel', 'spreadsheetml', 'vnd.ms-excel', 'octet-stream'])
+            if is_excel:
+                # response.content 를 거치지 않고 소켓 스트림을 버퍼로 바로 복사 (gzip/deflate 는 urllib3 에서 해제)
+                response.raw.decode_content = True
+                # 응답 본문을 메모리 대신 임시 파일로 받아 큰 보고서에서도 최대 메모리 사용량을 제한
+                # (SpooledTemporaryFile 은 Python 3.9 에서 seekable() 이 없어 pandas/openpyxl 이 읽지 못함)
+                excel_data = tempfile.TemporaryFile(); download_ok = False
+                try: # 스트리밍 도중 끊기거나 오류 응답이면 임시 파일을 여기서 닫음 (호출 측에는 성공한 파일만 넘김)
+                    shutil.copyfileobj(response.raw, excel_data, length=64 * 1024); file_size = excel_data.tell(); excel_data.seek(0); logger.info(f"Downloaded Excel data ({file_size} bytes).")
+                    if file_size < 1024:
+                        logger.warning(f"Small file ({file_size} bytes). Checking content for potential errors.");
+                        try:
+                            preview = excel_data.read(500).decode('utf-8', errors='ignore')
+                            if any(kw in preview.lower() for kw in ['error', '오류', '로그인', '권한', '세션', 'login', 'session', 'invalid']):
+                                logger.error(f"Small file content suggests error: {preview}"); return None
+                        except Exception as prev_err: logger.warning(f"Small file preview check failed: {prev_err}");
+                        excel_data.seek(0)
+                    download_ok = True
+                    return excel_data
+                finally:
+                    if not download_ok: excel_data.close()
+            else:
+                logger.error(f"Downloaded content type is not Excel. Type: {content_type}")
                 try:
-                    preview = excel_data.getvalue()[:500].decode('utf-8', errors='ignore')
-                    if any(kw in preview.lower() for kw in ['error', '오류', '로그인', '권한', '세션', 'login', 'session', 'invalid']):
-                        log_message(f"Small file content suggests error: {preview}", "ERROR"); return None
-                except Exception as prev_err: log_message(f"Small file preview check failed: {prev_err}", "WARNING");
-                excel_data.seek(0)
-            return excel_data
-        else:
-            log_message(f"Downloaded content type is not Excel. Type: {content_type}", "ERROR")
-            try:
-                error_content = response.text[:1000]
-                log_message(f"Non-excel content preview: {error_content}", "DEBUG")
-            except Exception as text_err:
-                log_message(f"Could not get text preview of non-excel content: {text_err}", "WARNING")
-            return None
-    except requests.exceptions.RequestException as e: log_message(f"Download error: {e}", "ERROR"); logging.exception("Download error:"); return None
-    except Exception as e: log_message(f"Unexpected download error: {e}", "ERROR"); logging.exception("Download unexpected error:"); return None
+                    error_content = response.text[:1000]
+                    logger.debug("Non-excel content preview: %s", error_content)
+                except Exception as text_err:
+                    logger.warning(f"Could not get text preview of non-excel content: {text_err}")
+                return None
+    except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e: # response.raw 스트리밍 중 오류는 urllib3 예외(ProtocolError, ReadTimeoutError 등)로 올라옴
+        logger.error(f"Download error: {e}"); logger.exception("Download error:"); return None
+    except Exception as e: logger.error(f"Unexpected download error: {e}"); logger.exception("Download unexpected error:"); return None
 
 def parse_time_robust(time_str):
-    if pd.isna(time_str) or time_str == '-': return None; time_str = str(time_str).strip()
-    if isinstance(time_str, datetime.time): return time_str;
+    if pd.isna(time_str) or time_str == '-': return None
     if isinstance(time_str, datetime.datetime): return time_str.time()
+    if isinstance(time_str, datetime.time): return time_str
+    time_str = str(time_str).strip()
     if not time_str: return None
     for fmt in ('%H:%M:%S', '%H:%M', '%Y-%m-%d %H:%M:%S'):
         try: return datetime.datetime.strptime(time_str.split('.')[0], fmt).time()
         except ValueError: continue
-    log_message(f"Could not parse time: {time_str}", "DEBUG")
+    logger.debug("Could not parse time: %s", time_str)
     return None
 
 def parse_date_robust(date_str):
-    if pd.isna(date_str) or date_str == '-': return None; date_str = str(date_str).strip()
-    if isinstance(date_str, datetime.date): return date_str
+    if pd.isna(date_str) or date_str == '-': return None
     if isinstance(date_str, datetime.datetime): return date_str.date()
+    if isinstance(date_str, datetime.date): return date_str
+    date_str = str(date_str).strip()
     if not date_str: return None
     date_part = date_str.split(' ')[0]
     try: return datetime.datetime.strptime(date_part, '%Y-%m-%d').date()
@@ -341,16 +563,120 @@ def parse_date_robust(date_str):
         if 30000 < numeric_date < 60000:
              return pd.to_datetime(numeric_date, unit='D', origin='1899-12-30').date()
     except (ValueError, TypeError): pass
-    log_message(f"Could not parse date: {date_str}", "DEBUG")
-    return None
-
-def combine_date_time(date_val, time_val):
-    if isinstance(date_val, datetime.date) and isinstance(time_val, datetime.time):
-        return datetime.datetime.combine(date_val, time_val)
+    logger.debug("Could not parse date: %s", date_str)
     return None
 
-def analyze_attendance(excel_data, sheet_name, target_date):
-    log_message(f"Analyzing sheet '{sheet_name}' for {target_date.strftime('%Y-%m-%d')}.")
+_UNPARSED_CELL_TEXTS = ['', '-', 'nan', 'None', 'NaT']
+_EMPTY_ERP_TEXTS = ('nan', 'None', '')
+
+def _missing_to_none(parsed):
+    # NaT 는 truthy 이므로 이후 `if c_in:` 같은 검사에서 값으로 취급되지 않도록 None 으로 통일
+    parsed = parsed.astype(object)
+    parsed[parsed.isna()] = None
+    return parsed
+
+def _time_to_us(series):
+    # datetime.time 열 -> 자정 기준 마이크로초(float, 없으면 NaN). NaN 비교는 항상 False 라 `if ls and ...` 검사와 같게 동작
+    return pd.Series([(t.hour * 3600 + t.minute * 60 + t.second) * 1_000_000 + t.microsecond if t is not None else float('nan') for t in series.to_numpy()],
+                     index=series.index, dtype='float64')
+
+def _us_to_time(us):
+    us = int(us); return datetime.time(us // 3_600_000_000, us // 60_000_000 % 60, us // 1_000_000 % 60, us % 1_000_000)
+
+def ffill_blank_rows(frame, blank_texts):
+    # 모든 열이 빈 행(병합 셀 아래의 연속 행)만 위쪽 마지막 행의 값을 열 전체로 함께 가져오고, 나머지 빈 값은 ''.
+    # 열마다 따로 채우면 ERP 만 빈 행(이름은 있음)이 윗사람 ERP 를 받아 다른 직원 그룹에 섞이므로 행 단위로 채움.
+    # object 열을 NaN 으로 바꿔 ffill 하면 pandas 2.2 에서 다운캐스트 FutureWarning 이 나므로 행 위치(숫자 열)를 채운 뒤 값을 가져옴
+    blank = frame.isin(blank_texts); continuation = blank.all(axis=1)
+    source_pos = pd.Series(range(len(frame)), index=frame.index).where(~continuation).ffill()
+    take = (continuation & source_pos.notna()).to_numpy()
+    values = frame.mask(blank, '').to_numpy(dtype=object, copy=True)
+    values[take] = values[source_pos[take].astype(int).to_numpy()]
+    return pd.DataFrame(values, index=frame.index, columns=frame.columns)
+
+def parse_date_series(series):
+    # 대부분의 셀('YYYY-MM-DD ...')은 pandas 벡터 파서로 한 번에 처리하고, 남은 셀만 parse_date_robust 로 처리
+    text = series.astype(str).str.strip().str.split(' ').str[0]
+    parsed = pd.to_datetime(text, format='%Y-%m-%d', errors='coerce').dt.date
+    leftover = parsed.isna() & series.notna() & ~text.isin(_UNPARSED_CELL_TEXTS)
+    if leftover.any():
+        parsed = parsed.astype(object); parsed[leftover] = series[leftover].apply(parse_date_robust)
+    return _missing_to_none(parsed)
+
+def parse_time_series(series):
+    # '%H:%M:%S' -> '%H:%M' -> '%Y-%m-%d %H:%M:%S' 순서로 벡터 파싱 후, 남은 셀만 parse_time_robust 로 처리
+    text = series.astype(str).str.strip().str.split('.').str[0]
+    parsed = pd.to_datetime(text, format='%H:%M:%S', errors='coerce')
+    for fmt in ('%H:%M', '%Y-%m-%d %H:%M:%S'):
+        missing = parsed.isna()
+        if not missing.any(): break
+        parsed = parsed.combine_first(pd.to_datetime(text.where(missing), format=fmt, errors='coerce'))
+    parsed = parsed.dt.time
+    leftover = parsed.isna() & series.notna() & ~text.isin(_UNPARSED_CELL_TEXTS)
+    if leftover.any():
+        parsed = parsed.astype(object); parsed[leftover] = series[leftover].apply(parse_time_robust)
+    return _missing_to_none(parsed)
+
+def flatten_excel_columns(multi_columns):
+    new_columns = []
+    for col_tuple in multi_columns:
+        level0 = str(col_tuple[0]).strip(); level1 = str(col_tuple[1]).strip(); level0 = '' if 'Unnamed:' in level0 else level0; level1 = '' if 'Unnamed:' in level1 else level1
+        if level0 and level1 and level0 != level1: new_col = f"{level0}_{level1}"
+        elif level1: new_col = level1
+        elif level0: new_col = level0
+        else: new_col = f"col_{len(new_columns)}"
+        new_columns.append(new_col.strip('_'))
+    return new_columns
+
+def find_column_indices(columns):
+    col_indices = {}; missing_cols = []
+    lookup = {}
+    for idx, col_name in enumerate(columns): lookup.setdefault(col_name.lower(), idx) # 이름이 중복되면 앞쪽 열 우선 (기존 순차 탐색과 동일)
+    for key, potential_names in COLUMN_MAPPING.items():
+        found = False
+        for name in potential_names:
+            idx = lookup.get(name.strip().lower())
+            if idx is not None: col_indices[key] = idx; found = True; break
+        if not found and key != 'dept':
+             missing_cols.append(f"{key} (tried: {', '.join(potential_names)})")
+        elif not found and key == 'dept':
+             logger.warning("Optional '부서' column not found, will use default team name.")
+    return col_indices, missing_cols
+
+# strftime 의 포맷 해석 없이 정수 포맷만 사용, 하루 보고서의 시각 종류는 많지 않아 결과를 캐시
+@functools.lru_cache(maxsize=128)
+def _hm(t): return f"{t.hour:02d}:{t.minute:02d}"
+@functools.lru_cache(maxsize=128)
+def _hms(t): return f"{t.hour:02d}:{t.minute:02d}:{t.second:02d}"
+
+def open_excel_file(excel_data):
+    # python-calamine(Rust) 이 있으면 openpyxl 보다 훨씬 빠르게 파싱, 없거나 pandas 가 지원하지 않으면 openpyxl 사용
+    if EXCEL_ENGINE == "calamine":
+        try: return pd.ExcelFile(excel_data, engine="calamine")
+        except (ImportError, ValueError) as engine_err:
+            logger.warning(f"calamine engine unavailable ({engine_err}). Falling back to openpyxl.")
+            if hasattr(excel_data, 'seek'): excel_data.seek(0)
+    return pd.ExcelFile(excel_data, engine="openpyxl")
+
+class EmployeeStatus(NamedTuple):
+    # 직원 한 명의 분석 결과 (요약 집계와 보고서 작성에서만 사용, 필드 구성이 고정이라 dict 대신 튜플)
+    name: str
+    status: str # 'target' / 'excluded'
+    covers_morning: bool
+    covers_afternoon: bool
+    took_leave: bool
+    leave_details: str
+    has_clock_in: bool
+    has_clock_out: bool
+    in_time_str: str
+    out_time_str: str
+    issue_types: list
+
+def format_issue_prefix(issue_types):
+    return f"[{'/'.join(issue_types)}] " if issue_types else ""
+
+def analyze_attendance(excel_data, sheet_name, target_date, is_eve_run=None):
+    logger.info(f"Analyzing sheet '{sheet_name}' for {target_date.strftime('%Y-%m-%d')}.")
     target_date_str = target_date.strftime('%Y-%m-%d')
     analysis_result = {
         "notifications": [],
@@ -364,79 +690,56 @@ def analyze_attendance(excel_data, sheet_name, target_date):
     employee_statuses = {}
 
     try:
-        header_indices = [0, 1]; log_message(f"Reading Excel with header rows {header_indices[0]+1}-{header_indices[1]+1}.", "INFO")
+        header_indices = EXCEL_HEADER_ROWS; logger.info(f"Reading Excel with header rows {header_indices[0]+1}-{header_indices[-1]+1}.")
         try:
-             df = pd.read_excel(excel_data, sheet_name=sheet_name, header=header_indices)
+             with open_excel_file(excel_data) as excel_file:
+                  # 헤더만 먼저 읽어 필요한 컬럼 위치를 찾은 뒤, 해당 컬럼만 파싱 (다중 헤더에는 usecols 사용 불가)
+                  header_df = excel_file.parse(sheet_name, header=header_indices, nrows=0)
+                  header_columns = flatten_excel_columns(header_df.columns)
+                  col_indices, missing_cols = find_column_indices(header_columns)
+                  usecols = None if missing_cols else sorted(set(col_indices.values()))
+                  df = excel_file.parse(sheet_name, header=None, skiprows=len(header_indices), usecols=usecols, dtype=str) # 타입 추론 생략, 파싱은 parse_*_series 가 담당
         except ValueError as ve:
              if "Worksheet named" in str(ve) and sheet_name in str(ve):
-                  log_message(f"FATAL: Excel sheet named '{sheet_name}' not found.", "ERROR")
+                  logger.error(f"FATAL: Excel sheet named '{sheet_name}' not found.")
                   analysis_result["summary"]["total_employees"] = -1; analysis_result["plain_text_report"] = f"{target_date_str} 분석 오류\n엑셀 시트 '{sheet_name}'을 찾을 수 없습니다."; return analysis_result
              else: raise
-        log_message(f"Loaded {len(df)} rows.")
-
-        original_multi_columns = df.columns; new_columns = []
-        for col_tuple in original_multi_columns:
-            level0 = str(col_tuple[0]).strip(); level1 = str(col_tuple[1]).strip(); level0 = '' if 'Unnamed:' in level0 else level0; level1 = '' if 'Unnamed:' in level1 else level1
-            if level0 and level1 and level0 != level1: new_col = f"{level0}_{level1}"
-            elif level1: new_col = level1
-            elif level0: new_col = level0
-            else: new_col = f"col_{len(new_columns)}"
-            new_columns.append(new_col.strip('_'))
-        df.columns = new_columns; log_message(f"Flattened columns: {df.columns.tolist()}", "DEBUG")
-        if df.empty: log_message("Excel sheet empty.", "WARNING"); analysis_result["plain_text_report"] = f"{target_date_str} 분석 정보\n데이터 없음."; return analysis_result
-
-        column_mapping = {
-            'erp': ['ERP사번'], 'name': ['이름'], 'date': ['일자'],
-            'dept': ['부서'],
-            'type': ['근태_유형', '유형'], 'category': ['근태_구분', '구분'],
-            'clock_in_time': ['출퇴근_출근시간', '출근시간'], 'clock_out_time': ['출퇴근_퇴근시간', '퇴근시간'],
-            'leave_start_time': ['휴가/출장/교육 일시_시작시간', '시작시간'], 'leave_end_time': ['휴가/출장/교육 일시_종료시간', '종료시간'],
-        }
-        col_indices = {}; missing_cols = []; original_columns = df.columns.tolist()
-        dept_column_original_name = None
-        for key, potential_names in column_mapping.items():
-            found = False
-            for name in [p.strip() for p in potential_names]:
-                for idx, col_name in enumerate(original_columns):
-                    if name.lower() == col_name.lower():
-                        col_indices[key] = idx
-                        if key == 'dept': dept_column_original_name = col_name
-                        found = True; break
-                if found: break
-            if not found and key != 'dept':
-                 missing_cols.append(f"{key} (tried: {', '.join(potential_names)})")
-            elif not found and key == 'dept':
-                 log_message("Optional '부서' column not found, will use default team name.", "WARNING")
+        logger.info(f"Loaded {len(df)} rows ({len(df.columns)} of {len(header_columns)} columns).")
+
+        if df.empty: logger.warning("Excel sheet empty."); analysis_result["plain_text_report"] = f"{target_date_str} 분석 정보\n데이터 없음."; return analysis_result
+        if usecols is None:
+            df.columns = (header_columns + [f"col_{i}" for i in range(len(header_columns), len(df.columns))])[:len(df.columns)]
+        else:
+            df.columns = [header_columns[idx] for idx in usecols]
+        logger.debug("Flattened columns: %s", df.columns.tolist())
+
+        original_columns = df.columns.tolist()
+        col_original_name = {key: header_columns[idx] for key, idx in col_indices.items()}
+        dept_column_original_name = col_original_name.get('dept')
 
         if missing_cols:
-            log_message(f"FATAL: Missing required columns: {', '.join(missing_cols)}", "ERROR")
-            log_message(f"Available columns in Excel: {original_columns}", "DEBUG")
+            logger.error(f"FATAL: Missing required columns: {', '.join(missing_cols)}")
+            logger.debug("Available columns in Excel: %s", original_columns)
             analysis_result["summary"]["total_employees"] = -1
             analysis_result["plain_text_report"] = f"{target_date_str} 분석 오류\n필수 컬럼 누락: {', '.join(missing_cols)}\n사용 가능한 컬럼: {original_columns}"
             return analysis_result
 
-        erp_col_name = df.columns[col_indices['erp']]; name_col_name = df.columns[col_indices['name']]
-        if erp_col_name in df.columns: df[erp_col_name] = df[erp_col_name].astype(str).replace('nan', '').ffill().fillna('')
-        if name_col_name in df.columns: df[name_col_name] = df[name_col_name].astype(str).replace('nan', '').ffill().fillna('')
-
-        select_rename_map = {
-            df.columns[col_indices['erp']]: 'ERP_ID', df.columns[col_indices['name']]: '이름',
-            df.columns[col_indices['date']]: '일자', df.columns[col_indices['type']]: '유형',
-            df.columns[col_indices['category']]: '구분', df.columns[col_indices['clock_in_time']]: '출근시간_raw',
-            df.columns[col_indices['clock_out_time']]: '퇴근시간_raw', df.columns[col_indices['leave_start_time']]: '휴가시작시간_raw',
-            df.columns[col_indices['leave_end_time']]: '휴가종료시간_raw',
-        }
+        # 병합 셀로 ERP/이름이 모두 빈 연속 행만 위 행의 (ERP, 이름)으로 채움. ERP 만 빈 행은 그대로 두어 아래 ERP 필터에서 제외
+        erp_name_cols = [col_original_name['erp'], col_original_name['name']]
+        df[erp_name_cols] = ffill_blank_rows(df[erp_name_cols].astype(str), ('nan', ''))
+
+        select_rename_map = {col_original_name[key]: target for key, target in COLUMN_TARGETS.items() if key in col_original_name}
         dept_col_name_target = '부서_raw'
         if dept_column_original_name:
             select_rename_map[dept_column_original_name] = dept_col_name_target
-            log_message(f"Mapping original column '{dept_column_original_name}' to '{dept_col_name_target}' for department.", "DEBUG")
+            logger.debug("Mapping original column '%s' to '%s' for department.", dept_column_original_name, dept_col_name_target)
         else:
             dept_col_name_target = None
 
         source_columns_to_keep = list(select_rename_map.keys())
         missing_source_cols = [col for col in source_columns_to_keep if col not in df.columns]
         if missing_source_cols:
-            log_message(f"FATAL: Source columns mapped incorrectly or missing after flatten/case check: {missing_source_cols}", "ERROR")
+            logger.error(f"FATAL: Source columns mapped incorrectly or missing after flatten/case check: {missing_source_cols}")
             analysis_result["summary"]["total_employees"] = -1
             analysis_result["plain_text_report"] = f"{target_date_str} 분석 오류\n내부 컬럼 선택 오류."
             return analysis_result
@@ -444,25 +747,25 @@ def analyze_attendance(excel_data, sheet_name, target_date):
         df_processed = df[source_columns_to_keep].copy(); df_processed = df_processed.rename(columns=select_rename_map)
 
         try:
-            df_processed['일자_dt'] = df_processed['일자'].apply(parse_date_robust)
-            df_processed['출근시간_dt'] = df_processed['출근시간_raw'].apply(parse_time_robust)
-            df_processed['퇴근시간_dt'] = df_processed['퇴근시간_raw'].apply(parse_time_robust)
-            df_processed['휴가시작시간_dt'] = df_processed['휴가시작시간_raw'].apply(parse_time_robust)
-            df_processed['휴가종료시간_dt'] = df_processed['휴가종료시간_raw'].apply(parse_time_robust)
+            # 날짜로 먼저 거른 뒤 대상 날짜 행만 시간 파싱
+            df_processed['일자_dt'] = parse_date_series(df_processed['일자'])
+            df_filtered_by_date = df_processed[df_processed['일자_dt'] == target_date].copy()
+            df_filtered_by_date['출근시간_dt'] = parse_time_series(df_filtered_by_date['출근시간_raw'])
+            df_filtered_by_date['퇴근시간_dt'] = parse_time_series(df_filtered_by_date['퇴근시간_raw'])
+            df_filtered_by_date['휴가시작시간_dt'] = parse_time_series(df_filtered_by_date['휴가시작시간_raw'])
+            df_filtered_by_date['휴가종료시간_dt'] = parse_time_series(df_filtered_by_date['휴가종료시간_raw'])
         except Exception as parse_err:
-            log_message(f"FATAL: Data parsing error: {parse_err}", "ERROR"); logging.exception("Data parsing error:")
+            logger.error(f"FATAL: Data parsing error: {parse_err}"); logger.exception("Data parsing error:")
             analysis_result["summary"]["total_employees"] = -1; analysis_result["plain_text_report"] = f"{target_date_str} 분석 오류\n데이터 파싱 중 에러."
             return analysis_result
 
-        df_filtered_by_date = df_processed[df_processed['일자_dt'] == target_date].copy()
         if df_filtered_by_date.empty:
-            log_message(f"No data found for target date {target_date_str}.", "WARNING")
+            logger.warning(f"No data found for target date {target_date_str}.")
             analysis_result["summary"]["total_employees"] = 0; analysis_result["plain_text_report"] = f"{target_date_str} 분석 정보\n데이터 없음."
             return analysis_result
 
-        employee_names = df_filtered_by_date['이름'].astype(str).str.strip().replace('', np.nan).dropna()
-        analysis_result["summary"]["total_employees"] = employee_names.nunique()
-        log_message(f"Total employees identified for {target_date_str}: {analysis_result['summary']['total_employees']} (based on unique names)")
+        analysis_result["summary"]["total_employees"] = df_filtered_by_date['이름'].astype(str).str.strip().replace('', pd.NA).nunique(dropna=True)
+        logger.info(f"Total employees identified for {target_date_str}: {analysis_result['summary']['total_employees']} (based on unique names)")
 
         team_name = "팀"
         if dept_col_name_target and dept_col_name_target in df_filtered_by_date.columns and not df_filtered_by_date.empty:
@@ -472,129 +775,108 @@ def analyze_attendance(excel_data, sheet_name, target_date):
                     if not dept_full_name_series.empty:
                         dept_full_name_obj = dept_full_name_series.iloc[0]
                         dept_full_name = str(dept_full_name_obj).strip() if pd.notna(dept_full_name_obj) else ""
-                        log_message(f"Attempting team name extraction from '{dept_col_name_target}': Value='{dept_full_name}'", "DEBUG")
+                        logger.debug("Attempting team name extraction from '%s': Value='%s'", dept_col_name_target, dept_full_name)
 
                         if dept_full_name and '-' in dept_full_name:
                             parts = dept_full_name.split('-', 1)
                             split_parts = [p.strip() for p in parts if p.strip()]
-                            log_message(f"Split result for '{dept_full_name}' using '-': {split_parts}", "DEBUG")
+                            logger.debug("Split result for '%s' using '-': %s", dept_full_name, split_parts)
                             if len(split_parts) > 1: team_name = split_parts[1]
                             elif split_parts: team_name = split_parts[0]
                         elif dept_full_name and len(dept_full_name) < 20 :
                             team_name = dept_full_name
                         else:
-                            log_message(f"Department string format not suitable or missing '-': '{dept_full_name}'. Using default team name.", "WARNING")
+                            logger.warning(f"Department string format not suitable or missing '-': '{dept_full_name}'. Using default team name.")
                     else:
-                        log_message(f"'{dept_col_name_target}' column has no valid (non-NaN) values for team name extraction.", "WARNING")
+                        logger.warning(f"'{dept_col_name_target}' column has no valid (non-NaN) values for team name extraction.")
                 else:
-                    log_message(f"Filtered DataFrame has no valid index for iloc[0] to extract team name.", "WARNING")
+                    logger.warning(f"Filtered DataFrame has no valid index for iloc[0] to extract team name.")
             except Exception as e:
-                 log_message(f"Error extracting team name: {e}", "WARNING")
-                 logging.exception("Team Name Extraction Error")
+                 logger.warning(f"Error extracting team name: {e}")
+                 logger.exception("Team Name Extraction Error")
         else:
-             if df_filtered_by_date.empty: log_message("Filtered data is empty, cannot extract team name.", "WARNING")
-             elif not dept_col_name_target or dept_col_name_target not in df_filtered_by_date.columns: log_message(f"Column '{dept_col_name_target}' (mapped from '부서') not found in filtered data, cannot extract team name.", "WARNING")
-             else: log_message("Cannot extract team name for unknown reason (dept column might be all NaN).", "WARNING")
+             if df_filtered_by_date.empty: logger.warning("Filtered data is empty, cannot extract team name.")
+             elif not dept_col_name_target or dept_col_name_target not in df_filtered_by_date.columns: logger.warning(f"Column '{dept_col_name_target}' (mapped from '부서') not found in filtered data, cannot extract team name.")
+             else: logger.warning("Cannot extract team name for unknown reason (dept column might be all NaN).")
 
         analysis_result['team_name'] = team_name
-        log_message(f"Final team name stored in analysis_result: '{analysis_result['team_name']}'", "INFO")
+        logger.info(f"Final team name stored in analysis_result: '{analysis_result['team_name']}'")
 
-        df_filtered_by_date['ERP_ID_Clean'] = df_filtered_by_date['ERP_ID'].astype(str).str.strip().replace(r'^(nan|None|)$', '', regex=True)
-        valid_erp_rows_df = df_filtered_by_date[df_filtered_by_date['ERP_ID_Clean'] != ''].copy()
+        erp_id_clean = df_filtered_by_date['ERP_ID'].astype(str).str.strip()
+        valid_erp = ~erp_id_clean.isin(_EMPTY_ERP_TEXTS)
+        valid_erp_rows_df = df_filtered_by_date.loc[valid_erp].assign(ERP_ID_Clean=erp_id_clean[valid_erp]) # assign 이 새 프레임을 만들므로 별도 copy 불필요
 
         if valid_erp_rows_df.empty:
-            log_message("No rows with valid ERP IDs found after filtering. Cannot process details.", "WARNING")
-            grouped_by_erp = pd.DataFrame().groupby(None)
-            num_groups_processed = 0
+            logger.warning("No rows with valid ERP IDs found after filtering. Cannot process details.")
+            names_by_erp = pd.Series(dtype=object); clock_in_by_erp = {}; clock_out_by_erp = {}; leaves_by_erp = {}
         else:
-            grouped_by_erp = valid_erp_rows_df.groupby('ERP_ID_Clean', sort=False)
-            num_groups_processed = len(grouped_by_erp)
-        log_message(f"Processing details for {num_groups_processed} unique ERP IDs.")
-
-
-        for erp_id, group_df in grouped_by_erp:
-            display_name = str(group_df['이름'].iloc[0]).strip();
+            # 빈 셀이 'nan' 문자열로 바뀌어 '법정휴가 (nan)' 처럼 보고되지 않도록 먼저 빈 문자열로 채움
+            valid_erp_rows_df['유형'] = valid_erp_rows_df['유형'].fillna('').astype(str).str.strip()
+            valid_erp_rows_df['구분'] = valid_erp_rows_df['구분'].fillna('').astype(str).str.strip()
+            is_commute = valid_erp_rows_df['유형'].eq(NORMAL_WORK_TYPE)
+            is_leave = valid_erp_rows_df['유형'].isin(LEAVE_ACTIVITY_TYPES)
+
+            # 이름은 그룹의 첫 행 기준, 출근은 첫 기록 / 퇴근은 마지막 기록 (first/last 는 None 을 건너뜀)
+            names_by_erp = valid_erp_rows_df.groupby('ERP_ID_Clean', sort=False)['이름'].first()
+            commute_grp = valid_erp_rows_df[is_commute].groupby('ERP_ID_Clean', sort=False).agg(
+                clock_in=('출근시간_dt', 'first'), clock_out=('퇴근시간_dt', 'last'))
+            clock_in_by_erp = commute_grp['clock_in'].to_dict(); clock_out_by_erp = commute_grp['clock_out'].to_dict()
+
+            # 휴가 분류는 행 단위 불리언 열로 계산한 뒤 ERP 별 any/min/max 로 한 번에 집계 (시각은 자정 기준 마이크로초)
+            leave_rows = valid_erp_rows_df[is_leave]
+            leave_type = leave_rows['유형']; leave_cat = leave_rows['구분']
+            leave_desc = leave_type.where(leave_cat.isin(('', '-')), leave_type + ' (' + leave_cat + ')')
+            ls = _time_to_us(leave_rows['휴가시작시간_dt']); le = _time_to_us(leave_rows['휴가종료시간_dt'])
+            has_ls = ls.notna(); has_le = le.notna(); is_trip = leave_type.eq('출장')
+            kind = leave_cat.map(_CAT_KIND).fillna('partial')
+            is_morn = kind.eq('morn'); is_aft = kind.eq('aft'); is_full = kind.eq('full'); is_partial = kind.eq('partial')
+            full_covers = is_full & ~(has_ls & has_le & ((ls > _US_WORK_START) | (le < _US_WORK_END))) # 종일 휴가라도 시간이 근무시간 안쪽이면 부분 휴가
+            partial_timed = is_partial & has_ls & has_le
+            open_trip = is_partial & has_ls & ~has_le & is_trip # 종료 시각 없는 출장은 하루 전체
+            covers_m_row = is_morn | full_covers | open_trip | (partial_timed & (ls <= _US_WORK_START) & (le >= _US_LUNCH_START))
+            covers_a_row = is_aft | full_covers | open_trip | (partial_timed & (ls < _US_WORK_END) & (le >= _US_LUNCH_END))
+            # 오후를 덮는 휴가 중 가장 이른 시작 시각 (오후 휴가일 때 예상 퇴근 시각으로 사용)
+            afternoon_start = (has_ls & (ls >= _US_LUNCH_START) & (ls < _US_WORK_END)
+                               & (is_aft | is_full | (le >= _US_LUNCH_END) | (~has_le & is_trip)))
+            leave_summary = pd.DataFrame({
+                'full_day_type': is_full | is_trip, 'spec_morn': is_morn, 'spec_aft': is_aft,
+                'covers_morn': covers_m_row, 'covers_aft': covers_a_row,
+                'min_start': ls, 'max_end': le, 'afternoon_start': ls.where(afternoon_start)
+            }).groupby(leave_rows['ERP_ID_Clean'], sort=False).agg(
+                {'full_day_type': 'any', 'spec_morn': 'any', 'spec_aft': 'any', 'covers_morn': 'any', 'covers_aft': 'any',
+                 'min_start': 'min', 'max_end': 'max', 'afternoon_start': 'min'})
+            # 보고서용 '설명 + 설명' 문자열도 ERP 별로 미리 합쳐 둠 (중복 제거 후 정렬)
+            leave_summary['descs'] = leave_desc.groupby(leave_rows['ERP_ID_Clean'], sort=False).unique().map(lambda descs: " + ".join(sorted(descs)))
+            leaves_by_erp = leave_summary.to_dict('index')
+        num_groups_processed = len(names_by_erp)
+        logger.info(f"Processing details for {num_groups_processed} unique ERP IDs.")
+
+
+        _dbg = logger.isEnabledFor(logging.DEBUG) # 직원별 디버그 로그 호출 자체를 건너뛰기 위해 루프 밖에서 한 번만 확인
+        for erp_id, display_name in names_by_erp.items():
+            display_name = str(display_name).strip();
             if not display_name: display_name = f"ID:{erp_id}"
 
-            collected_leaves = []; attendance_data = {'clock_in': None, 'clock_out': None, 'raw_in': '', 'raw_out': ''}
-            for _, row in group_df.iterrows():
-                att_type = str(row.get('유형', '')).strip(); att_cat = str(row.get('구분', '')).strip()
-                l_start = row.get('휴가시작시간_dt'); l_end = row.get('휴가종료시간_dt')
-                c_in = row.get('출근시간_dt'); c_out = row.get('퇴근시간_dt')
-
-                if att_type in LEAVE_ACTIVITY_TYPES:
-                    desc = f"{att_type} ({att_cat})" if att_cat and att_cat != '-' else att_type
-                    collected_leaves.append({'type': att_type, 'category': att_cat, 'start': l_start, 'end': l_end, 'desc': desc})
-                if att_type == NORMAL_WORK_TYPE:
-                    if c_in and not attendance_data['clock_in']:
-                        attendance_data['clock_in'] = c_in
-                        attendance_data['raw_in'] = str(row.get('출근시간_raw', ''))
-                    if c_out:
-                        attendance_data['clock_out'] = c_out
-                        attendance_data['raw_out'] = str(row.get('퇴근시간_raw', ''))
-
-            is_excluded = False; covers_morn = False; covers_aft = False;
-            is_spec_morn_half = False; is_spec_aft_half = False
-            min_l_start_actual = STD_WORK_END_TIME; max_l_end_actual = STD_WORK_START_TIME
-            leave_descs = set()
-            took_any_leave = bool(collected_leaves)
-
-            if collected_leaves:
-                for leave in collected_leaves:
-                    ls, le, cat, desc = leave['start'], leave['end'], leave['category'], leave['desc']
-                    leave_descs.add(desc); is_m = False; is_a = False
-
-                    if cat == MORNING_HALF_LEAVE_REASON: is_m = True; is_spec_morn_half = True
-                    elif cat == AFTERNOON_HALF_LEAVE_REASON: is_a = True; is_spec_aft_half = True
-                    elif cat in FULL_DAY_REASONS:
-                        if not (ls and le and (ls > STD_WORK_START_TIME or le < STD_WORK_END_TIME)):
-                            is_m = True; is_a = True
-                    elif ls and le:
-                        if ls <= STD_WORK_START_TIME and le >= STD_LUNCH_START_TIME: is_m = True
-                        if ls < STD_WORK_END_TIME and le >= STD_LUNCH_END_TIME: is_a = True
-                    elif ls and not le and leave['type'] == '출장':
-                        is_m = True; is_a = True
-
-                    if is_m: covers_morn = True
-                    if is_a: covers_aft = True
-                    if ls and ls < min_l_start_actual: min_l_start_actual = ls
-                    if le and le > max_l_end_actual: max_l_end_actual = le
-
-            leave_detail_for_report = ""
-            if covers_morn and covers_aft:
-                is_excluded = True
-                comb_desc = " + ".join(sorted(list(leave_descs)))
-                time_str = ""
-                is_full_day_type = any(c in FULL_DAY_REASONS or l['type'] == '출장' for l in collected_leaves for c in [l['category']])
-                if is_full_day_type : time_str = " (종일)"
-                elif min_l_start_actual != STD_WORK_END_TIME and max_l_end_actual != STD_WORK_START_TIME :
-                    time_str = f" ({min_l_start_actual.strftime('%H:%M')} - {max_l_end_actual.strftime('%H:%M')})"
-                leave_detail_for_report = f"{comb_desc}{time_str}"
-            elif took_any_leave:
-                 leave_detail_for_report = " + ".join(sorted(list(leave_descs)))
-
-
-            employee_statuses[display_name] = {
-                'name': display_name,
-                'status': 'excluded' if is_excluded else 'target',
-                'covers_morning': covers_morn,
-                'covers_afternoon': covers_aft,
-                'took_leave': took_any_leave,
-                'leave_details': leave_detail_for_report,
-                'has_clock_in': False,
-                'has_clock_out': False,
-                'in_time_str': "-",
-                'out_time_str': "-",
-                'issue_types': []
-            }
-
+            c_in = clock_in_by_erp.get(erp_id); c_out = clock_out_by_erp.get(erp_id)
+            attendance_data = {'clock_in': c_in if pd.notna(c_in) else None, 'clock_out': c_out if pd.notna(c_out) else None}
+
+            leave = leaves_by_erp.get(erp_id)
+            took_any_leave = leave is not None; is_excluded = False; leave_detail_for_report = ""
+            covers_morn = covers_aft = is_spec_morn_half = is_spec_aft_half = False
+            if took_any_leave:
+                covers_morn = bool(leave['covers_morn']); covers_aft = bool(leave['covers_aft'])
+                is_spec_morn_half = bool(leave['spec_morn']); is_spec_aft_half = bool(leave['spec_aft'])
+                is_excluded = covers_morn and covers_aft
+                leave_detail_for_report = leave['descs']
+                if is_excluded: # 제외 인원만 휴가 시간대 문구를 붙이고, 아래 예상 출퇴근 계산은 건너뜀
+                    if leave['full_day_type']: leave_detail_for_report += " (종일)"
+                    elif leave['min_start'] < _US_WORK_END and leave['max_end'] > _US_WORK_START: # 근무시간 안쪽 시각이 있을 때만 표시 (NaN 비교는 False)
+                        leave_detail_for_report += f" ({_hm(_us_to_time(leave['min_start']))} - {_hm(_us_to_time(leave['max_end']))})"
+
+            has_in = has_out = False; in_stat = out_stat = "-"; issue_type_flags = [] # 제외 인원은 기본값 그대로 사용
             if not is_excluded:
                 c_in_dt = attendance_data['clock_in']; c_out_dt = attendance_data['clock_out'];
-                act_start = combine_date_time(target_date, c_in_dt) if c_in_dt else None;
-                act_end = combine_date_time(target_date, c_out_dt) if c_out_dt else None
-                has_in = act_start is not None; has_out = act_end is not None
-                employee_statuses[display_name]['has_clock_in'] = has_in
-                employee_statuses[display_name]['has_clock_out'] = has_out
+                has_in = c_in_dt is not None; has_out = c_out_dt is not None # 같은 날짜이므로 시각(datetime.time)끼리 바로 비교
 
                 exp_start_time = STD_WORK_START_TIME
                 if is_spec_morn_half: exp_start_time = STD_MORNING_LEAVE_WORK_START
@@ -602,38 +884,22 @@ def analyze_attendance(excel_data, sheet_name, target_date):
 
                 exp_end_time = STD_WORK_END_TIME
                 if is_spec_aft_half: exp_end_time = STD_AFTERNOON_LEAVE_WORK_END
-                elif covers_aft:
-                    min_afternoon_leave_start = STD_WORK_END_TIME; found_afternoon_start = False
-                    for leave in collected_leaves:
-                        ls = leave.get('start')
-                        if ls and ls >= STD_LUNCH_START_TIME:
-                            le = leave.get('end'); does_cover_afternoon = False; l_cat = leave.get('category', ''); l_type = leave.get('type', '')
-                            if l_cat == AFTERNOON_HALF_LEAVE_REASON: does_cover_afternoon = True
-                            elif l_cat in FULL_DAY_REASONS: does_cover_afternoon = True
-                            elif ls < STD_WORK_END_TIME and le and le >= STD_LUNCH_END_TIME: does_cover_afternoon = True
-                            elif ls < STD_WORK_END_TIME and not le and l_type == '출장': does_cover_afternoon = True
-                            if does_cover_afternoon and ls < min_afternoon_leave_start:
-                                min_afternoon_leave_start = ls; found_afternoon_start = True
-                    if found_afternoon_start and min_afternoon_leave_start < STD_WORK_END_TIME:
-                        exp_end_time = min_afternoon_leave_start
-                    elif covers_aft and not found_afternoon_start:
-                        exp_end_time = STD_LUNCH_START_TIME
-
-
-                exp_start_dt = datetime.datetime.combine(target_date, exp_start_time)
-                exp_end_dt = datetime.datetime.combine(target_date, exp_end_time)
-                log_message(f"Debug {display_name}: covers_morn={covers_morn}, covers_aft={covers_aft}, spec_morn={is_spec_morn_half}, spec_aft={is_spec_aft_half} => Exp Start={exp_start_time}, Exp End={exp_end_time}", "DEBUG")
-
-                issue_type_flags = []
+                elif covers_aft: # 오후를 덮는 휴가 중 가장 이른 시작 시각까지 근무 (집계 단계에서 근무 종료 전 시각만 남김)
+                    afternoon_start = leave['afternoon_start']
+                    exp_end_time = STD_LUNCH_START_TIME if pd.isna(afternoon_start) else _us_to_time(afternoon_start)
+
+
+                if _dbg: logger.debug("Debug %s: covers_morn=%s, covers_aft=%s, spec_morn=%s, spec_aft=%s => Exp Start=%s, Exp End=%s",
+                                      display_name, covers_morn, covers_aft, is_spec_morn_half, is_spec_aft_half, exp_start_time, exp_end_time)
 
                 if has_in:
-                    if act_start > exp_start_dt:
+                    if c_in_dt > exp_start_time:
                         issue_type_flags.append("지각")
                 elif not covers_morn:
                      issue_type_flags.append("출근 기록 없음")
 
                 if has_out:
-                    actual_end_time = act_end.time()
+                    actual_end_time = c_out_dt
                     if not covers_aft and actual_end_time < STD_WORK_END_TIME :
                         issue_type_flags.append("조퇴")
                     elif covers_aft and actual_end_time < exp_end_time:
@@ -641,31 +907,34 @@ def analyze_attendance(excel_data, sheet_name, target_date):
                 elif not covers_aft and has_in :
                      issue_type_flags.append("퇴근 기록 없음")
 
-                employee_statuses[display_name]['issue_types'] = issue_type_flags
-
-                in_stat = c_in_dt.strftime('%H:%M:%S') if has_in else ("오전휴가" if covers_morn else "기록 없음")
+                in_stat = _hms(c_in_dt) if has_in else ("오전휴가" if covers_morn else "기록 없음")
                 out_stat = "-"
-                if has_out: out_stat = c_out_dt.strftime('%H:%M:%S')
+                if has_out: out_stat = _hms(c_out_dt)
                 else:
                     if covers_aft:
-                        leave_start_str = exp_end_time.strftime('%H:%M')
+                        leave_start_str = _hm(exp_end_time)
                         out_stat = f"오후휴가({leave_start_str}부터)"
                     elif has_in:
                         out_stat = "기록 없음"
                     elif not covers_morn :
                         out_stat = "미출근"
 
-                employee_statuses[display_name]['in_time_str'] = in_stat
-                employee_statuses[display_name]['out_time_str'] = out_stat
+            employee_statuses[display_name] = EmployeeStatus(
+                name=display_name, status='excluded' if is_excluded else 'target',
+                covers_morning=covers_morn, covers_afternoon=covers_aft,
+                took_leave=took_any_leave, leave_details=leave_detail_for_report,
+                has_clock_in=has_in, has_clock_out=has_out,
+                in_time_str=in_stat, out_time_str=out_stat, issue_types=issue_type_flags)
 
-        final_target = sum(1 for s in employee_statuses.values() if s['status'] == 'target')
-        final_excluded = sum(1 for s in employee_statuses.values() if s['status'] == 'excluded')
-        final_c_in = sum(1 for s in employee_statuses.values() if s.get('status') == 'target' and s.get('has_clock_in', False))
-        final_m_in = sum(1 for s in employee_statuses.values() if s.get('status') == 'target' and not s.get('covers_morning', False) and not s.get('has_clock_in', False))
-        final_c_out = sum(1 for s in employee_statuses.values() if s.get('status') == 'target' and s.get('has_clock_out', False))
-        final_m_out = sum(1 for s in employee_statuses.values() if s.get('status') == 'target' and \
-                          (s.get('has_clock_in', False) or s.get('covers_morning', False)) and \
-                          not s.get('covers_afternoon', False) and not s.get('has_clock_out', False))
+        # 요약 카운트는 한 번의 순회로 집계
+        final_target = final_excluded = final_c_in = final_m_in = final_c_out = final_m_out = 0
+        for s in employee_statuses.values():
+            if s.status != 'target': final_excluded += 1; continue
+            final_target += 1
+            if s.has_clock_in: final_c_in += 1
+            elif not s.covers_morning: final_m_in += 1
+            if s.has_clock_out: final_c_out += 1
+            elif (s.has_clock_in or s.covers_morning) and not s.covers_afternoon: final_m_out += 1
 
 
         analysis_result["summary"]["target"] = final_target
@@ -677,17 +946,17 @@ def analyze_attendance(excel_data, sheet_name, target_date):
 
         calc_total_processed = final_target + final_excluded
         if calc_total_processed != num_groups_processed and num_groups_processed > 0 :
-            log_message(f"Count mismatch! Processed groups ({num_groups_processed}) != Target({final_target})+Excluded({final_excluded})={calc_total_processed}. Check ERP/Name uniqueness.", "WARNING")
+            logger.warning(f"Count mismatch! Processed groups ({num_groups_processed}) != Target({final_target})+Excluded({final_excluded})={calc_total_processed}. Check ERP/Name uniqueness.")
 
-        log_message(f"Analysis complete. {analysis_result['summary']['target']} target employees, {analysis_result['summary']['excluded']} excluded employees.")
-        log_message(f"Final Summary Counts: Total(Name)={analysis_result['summary']['total_employees']}, Target={final_target}, Excl={final_excluded}, ClockedIn={final_c_in}, MissingIn={final_m_in}, ClockedOut={final_c_out}, MissingOut={final_m_out}")
+        logger.info(f"Analysis complete. {analysis_result['summary']['target']} target employees, {analysis_result['summary']['excluded']} excluded employees.")
+        logger.info(f"Final Summary Counts: Total(Name)={analysis_result['summary']['total_employees']}, Target={final_target}, Excl={final_excluded}, ClockedIn={final_c_in}, MissingIn={final_m_in}, ClockedOut={final_c_out}, MissingOut={final_m_out}")
 
         plain_text = []
-        now = datetime.datetime.now().time()
-        is_eve_run = now >= datetime.time(EVENING_RUN_THRESHOLD_HOUR, 0)
+        if is_eve_run is None: is_eve_run = datetime.datetime.now().hour >= EVENING_RUN_THRESHOLD_HOUR # 호출 측이 지정하지 않았을 때만 현재 시각 사용
+        run_label = '퇴근' if is_eve_run else '출근'
         summ = analysis_result["summary"]
 
-        title = f"{target_date_str} {'퇴근' if is_eve_run else '출근'} 현황 요약"
+        title = f"{target_date_str} {run_label} 현황 요약"
         plain_text.append(title)
         plain_text.append('-'*30)
         plain_text.append(f"총 인원: {summ.get('total_employees', 0)}명 (기준: 이름)")
@@ -703,37 +972,25 @@ def analyze_attendance(excel_data, sheet_name, target_date):
         missing_out_count = summ.get('missing_out', 0)
         plain_text.append(f"퇴근: {clocked_out_count}명 (미기록/오후휴가: {missing_out_count}명)")
 
-        leave_takers_list = []
+        # 이름순 정렬은 한 번만 하고, 휴가자 목록과 확인 대상 상세를 같은 순회에서 작성
+        leave_takers_list = []; target_employee_details_list = []
         for name, status_info in sorted(employee_statuses.items()):
-            if status_info.get('took_leave', False):
-                 leave_detail = status_info.get('leave_details', '정보 없음')
-                 leave_takers_list.append(f"- {name}: {leave_detail}")
+            if status_info.took_leave:
+                leave_takers_list.append(f"- {name}: {status_info.leave_details}")
+            if status_info.status == 'target':
+                target_employee_details_list.append(
+                    f"{len(target_employee_details_list) + 1}. {name}: {format_issue_prefix(status_info.issue_types)}출근={status_info.in_time_str}, 퇴근={status_info.out_time_str}")
 
         if leave_takers_list:
             plain_text.append(f"\n제외 및 휴가 인원 ({len(leave_takers_list)}명):")
-            for item in leave_takers_list:
-                plain_text.append(f"{item}")
+            plain_text.extend(leave_takers_list)
         else:
             plain_text.append(f"\n제외 및 휴가 인원: 없음")
 
         plain_text.append('\n' + '='*30 + '\n')
 
-        target_employee_details_list = []
-        target_employee_count_for_list = 0
-        for name, status_info in sorted(employee_statuses.items()):
-             if status_info['status'] == 'target':
-                 target_employee_count_for_list += 1
-                 issue_string = ""
-                 issue_types = status_info.get('issue_types', [])
-                 if issue_types:
-                      issue_string = f"[{'/'.join(issue_types)}] "
-
-                 in_status = status_info.get('in_time_str', '-')
-                 out_status = status_info.get('out_time_str', '-')
-                 target_employee_details_list.append(f"{target_employee_count_for_list}. {name}: {issue_string}출근={in_status}, 퇴근={out_status}")
-
         if target_employee_details_list:
-            plain_text.append(f"[{'퇴근' if is_eve_run else '출근'} 확인 대상 상세 현황] ({len(target_employee_details_list)}명)")
+            plain_text.append(f"[{run_label} 확인 대상 상세 현황] ({len(target_employee_details_list)}명)")
             plain_text.append('-'*30)
             plain_text.extend(target_employee_details_list)
         else:
@@ -745,32 +1002,44 @@ def analyze_attendance(excel_data, sheet_name, target_date):
                  plain_text.append(f"{target_date_str} 확인 대상 상세 정보 생성 오류.")
 
         analysis_result["plain_text_report"] = "\n".join(plain_text)
-        log_message("Plain text report generated.")
+        logger.info("Plain text report generated.")
         return analysis_result
 
     except pd.errors.EmptyDataError:
-        log_message(f"Excel sheet '{sheet_name}' is empty or unreadable.", "ERROR")
+        logger.error(f"Excel sheet '{sheet_name}' is empty or unreadable.")
         analysis_result["summary"]["total_employees"] = -1; analysis_result["plain_text_report"] = f"{target_date_str} 분석 오류\n엑셀 시트가 비어있거나 읽을 수 없습니다."; return analysis_result
     except KeyError as e:
-        log_message(f"KeyError during analysis, likely a missing column after mapping: {e}", "ERROR")
-        logging.exception("Analysis KeyError:")
+        logger.error(f"KeyError during analysis, likely a missing column after mapping: {e}")
+        logger.exception("Analysis KeyError:")
         analysis_result["summary"]["total_employees"] = -1; analysis_result["plain_text_report"] = f"{target_date_str} 분석 중 컬럼 오류 발생: {e}"; return analysis_result
     except Exception as e:
-        log_message(f"Unexpected analysis error: {e}", "ERROR"); logging.exception("Analysis unexpected error:")
+        logger.error(f"Unexpected analysis error: {e}"); logger.exception("Analysis unexpected error:")
         analysis_result["summary"]["total_employees"] = -1; analysis_result["plain_text_report"] = f"{target_date_str} 분석 중 예상치 못한 오류 발생: {e}"; return analysis_result
 
+def split_message_by_lines(message_text, max_length):
+    # 직원 한 줄이 두 메시지로 잘리지 않도록 줄 단위로 채우고, 한 줄이 max_length 보다 길 때만 강제로 자름
+    parts = []; buf = []; buf_len = 0
+    for line in message_text.split('\n'):
+        while len(line) > max_length:
+            if buf: parts.append('\n'.join(buf)); buf = []; buf_len = 0
+            parts.append(line[:max_length]); line = line[max_length:]
+        if buf and buf_len + 1 + len(line) > max_length:
+            parts.append('\n'.join(buf)); buf = []; buf_len = 0
+        buf_len += len(line) + (1 if buf else 0); buf.append(line)
+    if buf: parts.append('\n'.join(buf))
+    return parts
+
 def send_telegram_message(bot_token, chat_id, message_text):
     if not bot_token or not chat_id:
-        log_message("텔레그램 봇 토큰 또는 Chat ID가 설정되지 않았습니다. 메시지 전송을 건너뜁니다.", "ERROR")
+        logger.error("텔레그램 봇 토큰 또는 Chat ID가 설정되지 않았습니다. 메시지 전송을 건너뜁니다.")
         return False
 
     max_length = 4000
     messages_to_send = []
 
     if len(message_text) > max_length:
-        log_message(f"메시지 길이가 너무 깁니다 ({len(message_text)}자). 분할하여 전송합니다.", "INFO")
-        for i in range(0, len(message_text), max_length):
-            messages_to_send.append(message_text[i:i + max_length])
+        logger.info(f"메시지 길이가 너무 깁니다 ({len(message_text)}자). 분할하여 전송합니다.")
+        messages_to_send = split_message_by_lines(message_text, max_length)
     else:
         messages_to_send.append(message_text)
 
@@ -779,29 +1048,36 @@ def send_telegram_message(bot_token, chat_id, message_text):
         payload = {'chat_id': chat_id, 'text': part_message}
         send_url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
         try:
-            response = requests.post(send_url, data=payload, timeout=30)
-            response.raise_for_status()
-            log_message(f"텔레그램 메시지 전송 성공 (부분 {i+1}/{len(messages_to_send)}). 응답: {response.json()}", "INFO")
-            if len(messages_to_send) > 1 and i < len(messages_to_send) - 1 :
-                time.sleep(1.5)
-        except requests.exceptions.RequestException as e:
-            log_message(f"텔레그램 메시지 전송 실패 (부분 {i+1}): {e}", "ERROR")
-            if hasattr(e, 'response') and e.response is not None:
-                log_message(f"텔레그램 응답 내용: {e.response.text}", "ERROR")
+            response = _TG_POOL.request("POST", send_url, fields=payload, encode_multipart=False, timeout=30.0)
+            if response.status == 429: # 고정 대기 대신 텔레그램이 알려준 retry_after 만큼만 쉬고 한 번 재시도
+                retry_after = json.loads(response.data).get('parameters', {}).get('retry_after', 1)
+                logger.warning(f"텔레그램 전송 제한 (부분 {i+1}). {retry_after}초 후 재시도합니다.")
+                time.sleep(retry_after)
+                response = _TG_POOL.request("POST", send_url, fields=payload, encode_multipart=False, timeout=30.0)
+            if response.status >= 400:
+                logger.error(f"텔레그램 메시지 전송 실패 (부분 {i+1}): HTTP {response.status}")
+                logger.error(f"텔레그램 응답 내용: {response.data.decode('utf-8', errors='replace')}")
+                all_sent_successfully = False
+                break
+            logger.info(f"텔레그램 메시지 전송 성공 (부분 {i+1}/{len(messages_to_send)}). 응답: {json.loads(response.data)}")
+        except (urllib3.exceptions.HTTPError, ValueError) as e:
+            logger.error(f"텔레그램 메시지 전송 실패 (부분 {i+1}): {e}")
             all_sent_successfully = False
             break
     return all_sent_successfully
 
 
-def run_report_process(config, run_identifier="Scheduled"):
+def run_report_process(config, run_identifier="Scheduled", run_started_at=None):
     process_start_log = f"--- Starting report process ({run_identifier}) ---"
-    log_message(process_start_log)
+    logger.info(process_start_log)
 
     script_start_time = time.time()
-    target_date = datetime.date.today()
+    # 실행 식별자와 대상 날짜가 자정을 사이에 두고 어긋나지 않도록 같은 시각에서 계산
+    run_started_at = run_started_at or datetime.datetime.now()
+    target_date = run_started_at.date(); is_eve_run = run_started_at.hour >= EVENING_RUN_THRESHOLD_HOUR
     target_date_str = target_date.strftime("%Y-%m-%d")
     report_url = REPORT_DOWNLOAD_URL_TEMPLATE.format(date=target_date_str)
-    log_message(f"Target date: {target_date_str}")
+    logger.info(f"Target date: {target_date_str}")
 
     driver = None
     analysis_result = {}
@@ -810,41 +1086,56 @@ def run_report_process(config, run_identifier="Scheduled"):
     telegram_sent_successfully = False
 
     try:
-        log_message("Setting up WebDriver for the process...")
-        driver = setup_driver()
-
         try:
             if not config.get("WEBMAIL_USERNAME") or not config.get("WEBMAIL_PASSWORD"):
                 raise ValueError("웹메일 계정 정보(ID/PW)가 설정되지 않았습니다.")
-            log_message("Attempting login...")
-            cookies = login_and_get_cookies(driver, WEBMAIL_LOGIN_URL, WEBMAIL_ID_FIELD_ID, WEBMAIL_PW_FIELD_ID, config["WEBMAIL_USERNAME"], config["WEBMAIL_PASSWORD"])
+            logger.info("Attempting login via HTTP form post...")
+            http_session = login_via_requests(WEBMAIL_LOGIN_URL, WEBMAIL_ID_FIELD_ID, WEBMAIL_PW_FIELD_ID, config["WEBMAIL_USERNAME"], config["WEBMAIL_PASSWORD"])
+            excel_file_data = None
+            if http_session is not None: # HTTP 로그인 성공 시 쿠키는 이미 _HTTP 세션에 있음
+                logger.info("Attempting Excel download...")
+                excel_file_data = download_excel_report(report_url)
+                if excel_file_data is None: # 로그인 판정은 페이지 문자열 기준이라, 보고서 서버가 세션을 거부하면 브라우저 로그인으로 재시도
+                    logger.warning("Excel download after HTTP login failed. Falling back to browser login...")
+            else:
+                logger.info("HTTP login unavailable. Setting up WebDriver for browser login...")
 
-            log_message("Attempting Excel download...")
-            excel_file_data = download_excel_report(report_url, cookies)
             if excel_file_data is None:
-                raise Exception("Excel download failed or returned empty/invalid data.")
-            log_message("Excel downloaded successfully.")
+                # 브라우저 로그인 대기 동안 다운로드용 커넥션을 미리 열어 둠 (별도 쿠키 저장소를 쓰므로 _HTTP 세션과 겹치지 않음)
+                with ThreadPoolExecutor(max_workers=1) as prefetch_pool:
+                    warm_future = prefetch_pool.submit(warm_http_connection, report_url)
+                    driver = get_driver()
+                    logger.info("Attempting login...")
+                    cookies = login_and_get_cookies(driver, WEBMAIL_LOGIN_URL, WEBMAIL_ID_FIELD_ID, WEBMAIL_PW_FIELD_ID, config["WEBMAIL_USERNAME"], config["WEBMAIL_PASSWORD"])
+                    warm_future.result()
+
+                logger.info("Attempting Excel download...")
+                excel_file_data = download_excel_report(report_url, cookies)
+                if excel_file_data is None:
+                    raise Exception("Excel download failed or returned empty/invalid data.")
+            logger.info("Excel downloaded successfully.")
 
         except Exception as phase1_err:
             error_occurred = True
-            log_message(f"Setup/Login/Download Error: {phase1_err}", "ERROR")
+            logger.error(f"Setup/Login/Download Error: {phase1_err}")
             final_status_message = f"로그인 또는 다운로드 실패: {phase1_err}"
-            logging.error(f"Process stopped during Setup/Login/Download: {phase1_err}")
+            logger.error(f"Process stopped during Setup/Login/Download: {phase1_err}")
             raise
 
-        log_message("Proceeding with analysis...")
+        logger.info("Proceeding with analysis...")
         try:
-            analysis_result = analyze_attendance(excel_file_data, EXCEL_SHEET_NAME, target_date)
+            try: analysis_result = analyze_attendance(excel_file_data, EXCEL_SHEET_NAME, target_date, is_eve_run)
+            finally: excel_file_data.close(); excel_file_data = None # DataFrame 으로 읽은 뒤에는 다운로드 임시 파일을 바로 해제
             if not analysis_result or analysis_result.get("summary", {}).get("total_employees", -1) == -1:
                 error_occurred = True
                 final_status_message = analysis_result.get("plain_text_report", "분석 실패 (상세 메시지 없음).")
-                log_message(f"Analysis failed: {final_status_message}", "ERROR")
+                logger.error(f"Analysis failed: {final_status_message}")
             else:
-                log_message("Analysis completed successfully.")
+                logger.info("Analysis completed successfully.")
         except Exception as phase2_err:
             error_occurred = True
-            log_message(f"Analysis Error: {phase2_err}", "ERROR")
-            logging.exception("Analysis error:")
+            logger.error(f"Analysis Error: {phase2_err}")
+            logger.exception("Analysis error:")
             final_status_message = f"분석 오류: {phase2_err}"
             raise
 
@@ -859,7 +1150,7 @@ def run_report_process(config, run_identifier="Scheduled"):
                 message_title = f"[{config.get('SENDER_NAME', '근태봇')}] {target_date_str} {team_name_from_analysis} 근태 현황 ({run_identifier})"
                 full_message = f"{message_title}\n{'-'*20}\n{report_text}"
 
-                log_message("텔레그램으로 보고서 전송 시도...", "INFO")
+                logger.info("텔레그램으로 보고서 전송 시도...")
                 telegram_sent_successfully = send_telegram_message(telegram_bot_token, telegram_chat_id, full_message)
 
                 if telegram_sent_successfully:
@@ -867,18 +1158,18 @@ def run_report_process(config, run_identifier="Scheduled"):
                 else:
                     final_status_message = "텔레그램 메시지 발송 실패."
             else:
-                log_message("텔레그램 봇 토큰 또는 Chat ID가 설정되지 않았습니다. 메시지 전송을 건너뜁니다.", "WARNING")
+                logger.warning("텔레그램 봇 토큰 또는 Chat ID가 설정되지 않았습니다. 메시지 전송을 건너뜁니다.")
                 final_status_message = final_status_message or "텔레그램 설정 누락으로 발송 건너뜀"
         elif error_occurred:
-            log_message("이전 단계 오류로 인해 텔레그램 발송을 건너뜁니다.", "WARNING")
+            logger.warning("이전 단계 오류로 인해 텔레그램 발송을 건너뜁니다.")
             final_status_message = final_status_message or "텔레그램 발송 건너뜀 (이전 단계 오류)"
         else:
-            log_message("분석 결과가 유효하지 않아 텔레그램 발송을 건너뜁니다.", "WARNING")
+            logger.warning("분석 결과가 유효하지 않아 텔레그램 발송을 건너뜁니다.")
             final_status_message = final_status_message or "텔레그램 발송 건너뜀 (분석 결과 없음)"
 
     except Exception as outer_err:
-        log_message(f"Critical error in process ({run_identifier}): {outer_err}", "ERROR")
-        logging.exception(f"Critical Process Error ({run_identifier})")
+        logger.error(f"Critical error in process ({run_identifier}): {outer_err}")
+        logger.exception(f"Critical Process Error ({run_identifier})")
         error_occurred = True
         final_status_message = final_status_message or f"치명적 오류: {outer_err}"
         # 오류 발생 시 텔레그램으로 간략한 오류 알림 (선택 사항)
@@ -886,28 +1177,16 @@ def run_report_process(config, run_identifier="Scheduled"):
             error_report_text = f"[{config.get('SENDER_NAME', '근태봇')}] {target_date_str} 자동 근태 보고 중 오류 발생 ({run_identifier})\n오류: {str(outer_err)[:500]}..." # 오류 메시지 일부만 전송
             try:
                 send_telegram_message(config.get("TELEGRAM_BOT_TOKEN"), config.get("TELEGRAM_CHAT_ID"), error_report_text)
-                log_message("오류 발생 사실을 텔레그램으로 알렸습니다.", "INFO")
+                logger.info("오류 발생 사실을 텔레그램으로 알렸습니다.")
             except Exception as tel_err_report_err:
-                log_message(f"오류 알림 텔레그램 전송 실패: {tel_err_report_err}", "ERROR")
+                logger.error(f"오류 알림 텔레그램 전송 실패: {tel_err_report_err}")
 
 
     finally:
         if driver:
-            log_message("Process finished. Attempting to quit WebDriver...")
-            try:
-                driver.quit()
-                log_message("WebDriver closed successfully.")
-            except NoSuchWindowException:
-                 log_message("WebDriver window already closed or inaccessible during quit.", "WARNING")
-            except WebDriverException as e:
-                if "disconnected" in str(e).lower() or "invalid session id" in str(e).lower() or "unable to connect" in str(e).lower():
-                     log_message(f"WebDriver already disconnected or crashed before quit: {e}", "WARNING")
-                else:
-                     log_message(f"WebDriverException during quit: {e}", "WARNING")
-            except Exception as e:
-                log_message(f"Unexpected error during WebDriver quit: {e}", "WARNING")
+            logger.info("Process finished. WebDriver is kept for reuse and will be closed at exit.")
         else:
-             log_message("WebDriver instance was not available for quitting (likely setup failed).")
+             logger.info("WebDriver instance was not available (likely setup failed).")
 
         script_end_time = time.time()
         time_taken = script_end_time - script_start_time
@@ -921,7 +1200,7 @@ def run_report_process(config, run_identifier="Scheduled"):
 
         status_summary = final_status_message if final_status_message else completion_status
         final_log_message = f"--- Process ({run_identifier}) {completion_status} in {time_taken:.2f} seconds. Status: {status_summary} ---"
-        log_message(final_log_message, "ERROR" if error_occurred else "INFO")
+        logger.log(logging.ERROR if error_occurred else logging.INFO, final_log_message)
 
 
 def load_config_headless():
@@ -941,7 +1220,7 @@ def load_config_headless():
     missing_vars = [name for var, name in required_env_vars.items() if not config.get(var)]
     if missing_vars:
         msg = f"필수 환경 변수가 설정되지 않았습니다: {', '.join(missing_vars)}"
-        log_message(msg, "ERROR")
+        logger.error(msg)
         raise ValueError(msg)
     return config
 
@@ -955,28 +1234,29 @@ if __name__ == "__main__":
     # print(f"Config File (if used): {CONFIG_FILE}") # JSON 설정 파일 사용 안 함
     print(f"APP_ROOT_PATH (for bundled resources, if any): {APP_ROOT_PATH}")
 
-    log_message(f"--- Starting Headless Attendance Bot (ktMOS_DG_Headless) ---")
-    log_message(f"User Data Path set to: {USER_DATA_PATH}")
-    log_message(f"Log file: {LOG_FILE}")
+    logger.info(f"--- Starting Headless Attendance Bot (ktMOS_DG_Headless) ---")
+    logger.info(f"User Data Path set to: {USER_DATA_PATH}")
+    logger.info(f"Log file: {LOG_FILE}")
 
     loaded_config = None
     try:
         loaded_config = load_config_headless()
-        run_identifier = f"Run_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        run_report_process(loaded_config, run_identifier=run_identifier)
+        run_started_at = datetime.datetime.now()
+        run_identifier = f"Run_{run_started_at.strftime('%Y%m%d_%H%M%S')}"
+        run_report_process(loaded_config, run_identifier=run_identifier, run_started_at=run_started_at)
     except ValueError as ve:
-        log_message(f"Configuration error: {ve}", "ERROR")
+        logger.error(f"Configuration error: {ve}")
         sys.exit(1)
     except Exception as e:
-        log_message(f"An unexpected error occurred in the main execution block: {e}", "ERROR")
-        logging.exception("Fatal error during main execution.")
+        logger.error(f"An unexpected error occurred in the main execution block: {e}")
+        logger.exception("Fatal error during main execution.")
         if loaded_config and loaded_config.get("TELEGRAM_BOT_TOKEN") and loaded_config.get("TELEGRAM_CHAT_ID"):
            error_message = f"자동 근태 확인 봇 실행 중 심각한 오류 발생:\n{str(e)[:1000]}\n로그 파일을 확인하세요." # 오류 메시지 길이 제한
            try:
                send_telegram_message(loaded_config["TELEGRAM_BOT_TOKEN"], loaded_config["TELEGRAM_CHAT_ID"], error_message)
-               log_message("심각한 오류 발생 사실을 텔레그램으로 알렸습니다.", "INFO")
+               logger.info("심각한 오류 발생 사실을 텔레그램으로 알렸습니다.")
            except Exception as tel_err_report_err:
-               log_message(f"심각한 오류 알림 텔레그램 전송 실패: {tel_err_report_err}", "ERROR")
+               logger.error(f"심각한 오류 알림 텔레그램 전송 실패: {tel_err_report_err}")
         sys.exit(1)
     finally:
-        log_message("--- Headless Attendance Bot Finished ---")
+        logger.info("--- Headless Attendance Bot Finished ---")